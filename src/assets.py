@@ -0,0 +1,101 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from output import hash_file
+
+# hashlib releases the GIL while it hashes, so files are hashed in parallel on threads
+HASH_WORKERS = min(8, os.cpu_count() or 1)
+
+
+class HashCache:
+    """
+    Remembers the sha256 of source files between builds. A remembered hash is
+    trusted while the file keeps its size and modification time, the same
+    check make and rsync rely on, so unchanged files are not read again.
+
+    :param path: The JSON file the hashes are kept in
+    """
+    def __init__(self, path):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.__entries = {}
+        self.__used = {}
+        if os.path.isfile(path):
+            with open(path, "r") as file:
+                self.__entries = json.load(file)
+
+    def digests(self, paths, workers=HASH_WORKERS):
+        """
+        :param paths: The files to hash
+        :param workers: The number of threads files that changed are hashed on
+        :return: A dict mapping every path to its sha256
+        """
+        digests = {}
+        stale = []
+        for path in paths:
+            stat = os.stat(path)
+            entry = self.__entries.get(path)
+            if entry is not None and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+                digests[path] = entry[2]
+                self.hits += 1
+            else:
+                stale.append(path)
+            self.__used[path] = [stat.st_size, stat.st_mtime_ns, digests.get(path)]
+        self.misses += len(stale)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for path, digest in zip(stale, pool.map(hash_file, stale)):
+                digests[path] = digest
+                self.__used[path][2] = digest
+        return digests
+
+    def save(self, prune=True):
+        """
+        :param prune: Whether hashes of files not hashed since the cache was
+            opened are dropped; a partial build, like one shard, keeps them
+        """
+        entries = self.__used if prune else {**self.__entries, **self.__used}
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(entries, file, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+class AssetCopier:
+    """
+    Copies static and content assets into the output, storing each distinct
+    file once. Assets are collected first and hashed together, then the first
+    asset with given contents is copied and the later ones are made links to
+    it, hardlinks in directories and link entries in tar archives.
+
+    :param output: The output backend assets are written through
+    :param hash_cache: The HashCache source hashes come from
+    """
+    def __init__(self, output, hash_cache):
+        self.output = output
+        self.hash_cache = hash_cache
+        self.assets = []
+        self.copied = 0
+        self.linked = 0
+        self.linked_bytes = 0
+
+    def add(self, src_path, path):
+        self.assets.append((src_path, path))
+
+    def flush(self):
+        """Writes every asset added since the last flush, in the order they were added."""
+        digests = self.hash_cache.digests([src_path for src_path, _ in self.assets])
+        written = {}
+        for src_path, path in self.assets:
+            digest = digests[src_path]
+            if digest in written:
+                self.output.link_file(written[digest], path, src_path)
+                self.linked += 1
+                self.linked_bytes += os.path.getsize(src_path)
+            else:
+                self.output.copy_file(src_path, path, digest)
+                written[digest] = path
+                self.copied += 1
+        self.assets = []
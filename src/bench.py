@@ -0,0 +1,197 @@
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+from main import main as build_main, markdown_to_html_node, text_to_text_nodes
+from sitebuilder import SiteBuilder
+
+PARAGRAPH = ("Here's the deal, **I like Tolkien** and _Glorfindel_ more than `Legolas`. "
+             "See [the post](/blog/glorfindel) and ![a picture](/images/tom.png) for details. ")
+DOCUMENT = "\n\n".join([
+    "# Benchmark page",
+    PARAGRAPH * 4,
+    "## A list",
+    "\n".join(f"- item **{index}** with a [link](/page/{index})" for index in range(20)),
+    "> A quote\n> -- someone",
+    "```\ndef main():\n    print('hello')\n```",
+    "1. one\n2. two\n3. three",
+] * 10)
+# compare exits with this when there is no baseline to compare against yet
+NO_BASELINE = 2
+TEMPLATE = "<!doctype html><title>{{ Title }}</title><link href=\"{{basepath}}index.css\"><article>{{ Content }}</article>"
+
+
+def synthetic_site(pages=20):
+    site = {"template.html": TEMPLATE, "static/index.css": "body { margin: 0; }"}
+    for index in range(pages):
+        # Every body differs, so the document cache cannot serve one page's parse for another
+        body = DOCUMENT.replace("Benchmark page", f"Benchmark page {index}").replace("item", f"item {index}")
+        site[f"content/blog/post-{index}/index.md"] = f"---\ntitle: Post {index}\ndate: 2024-01-01\n---\n" + body
+    return site
+
+
+def bench_inline():
+    text_to_text_nodes(PARAGRAPH * 50)
+
+
+def bench_parse():
+    markdown_to_html_node(DOCUMENT)
+
+
+__TREE = markdown_to_html_node(DOCUMENT)
+
+
+def bench_serialize():
+    __TREE.to_html()
+
+
+__SITE = synthetic_site()
+
+
+def bench_build_memory():
+    SiteBuilder(__SITE).build()
+
+
+def bench_build_disk():
+    with tempfile.TemporaryDirectory() as root:
+        for path, text in __SITE.items():
+            os.makedirs(os.path.join(root, os.path.dirname(path)), exist_ok=True)
+            with open(os.path.join(root, path), "w") as file:
+                file.write(text)
+        cwd = os.getcwd()
+        os.chdir(root)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                build_main(["/"])
+        finally:
+            os.chdir(cwd)
+
+
+# name: (function, calls per sample)
+BENCHMARKS = {
+    "inline": (bench_inline, 20),
+    "parse": (bench_parse, 10),
+    "serialize": (bench_serialize, 50),
+    "build_memory": (bench_build_memory, 1),
+    "build_disk": (bench_build_disk, 1),
+}
+
+
+def median_confidence_interval(samples, z=1.96):
+    """
+    A distribution-free confidence interval for the median, taken from the
+    order statistics of the samples, so a few outliers from a noisy machine
+    do not move it the way they would move a mean.
+
+    :param samples: The measured times
+    :param z: The normal quantile of the interval; 1.96 gives about 95%
+    :return: A (low, high) tuple
+    """
+    ordered = sorted(samples)
+    count = len(ordered)
+    offset = z * math.sqrt(count) / 2
+    low = max(int(math.floor(count / 2 - offset)), 0)
+    high = min(int(math.ceil(count / 2 + offset)), count - 1)
+    return ordered[low], ordered[high]
+
+
+def summarize(samples):
+    low, high = median_confidence_interval(samples)
+    return {"median": statistics.median(samples), "ci_low": low, "ci_high": high, "samples": samples}
+
+
+def run_benchmarks(names, repeat):
+    """
+    Times every benchmark `repeat` times after one warm-up sample.
+
+    :return: A dict mapping benchmark names to their summaries, in seconds per call
+    """
+    results = {}
+    for name in names:
+        function, calls = BENCHMARKS[name]
+        samples = []
+        for sample in range(repeat + 1):
+            start = time.perf_counter()
+            for _ in range(calls):
+                function()
+            elapsed = (time.perf_counter() - start) / calls
+            if sample > 0:
+                samples.append(elapsed)
+        results[name] = summarize(samples)
+    return results
+
+
+def compare(baseline, current, threshold):
+    """
+    Compares benchmark results against a baseline. A benchmark regressed when
+    its median is more than `threshold` slower than the baseline median and
+    the confidence intervals of the two medians do not overlap, so noise alone
+    does not fail the comparison.
+
+    :return: A list of (name, ratio, status) tuples, status being "regressed",
+        "improved", "unchanged" or "new"
+    """
+    report = []
+    for name, result in current.items():
+        if name not in baseline:
+            report.append((name, None, "new"))
+            continue
+        previous = baseline[name]
+        ratio = result["median"] / previous["median"]
+        if ratio > 1 + threshold and result["ci_low"] > previous["ci_high"]:
+            status = "regressed"
+        elif ratio < 1 - threshold and result["ci_high"] < previous["ci_low"]:
+            status = "improved"
+        else:
+            status = "unchanged"
+        report.append((name, ratio, status))
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run benchmarks and compare them against a stored baseline. "
+                                                 "compare exits with 1 on a regression and 2 without a baseline.")
+    parser.add_argument("command", choices=["save", "compare"],
+                        help="save a new baseline, or compare against the stored one")
+    parser.add_argument("--baseline", default="bench_baseline.json", help="the baseline JSON file")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="relative slowdown of the median that counts as a regression")
+    parser.add_argument("--repeat", type=int, default=15, help="samples per benchmark")
+    parser.add_argument("--only", action="append", choices=sorted(BENCHMARKS), help="only run these benchmarks")
+    args = parser.parse_args(argv)
+    if args.command == "compare" and not os.path.isfile(args.baseline):
+        print(f"No baseline at {args.baseline}; record one on this machine with `python3 src/bench.py save`",
+              file=sys.stderr)
+        return NO_BASELINE
+
+    results = run_benchmarks(args.only or list(BENCHMARKS), args.repeat)
+    if args.command == "save":
+        with open(args.baseline, "w") as file:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(),
+                       "benchmarks": results}, file, indent=2, sort_keys=True)
+            file.write("\n")
+        for name, result in results.items():
+            print(f"{name:14} {result['median'] * 1000:9.3f} ms")
+        return 0
+
+    with open(args.baseline, "r") as file:
+        baseline = json.load(file)["benchmarks"]
+    regressed = False
+    for name, ratio, status in compare(baseline, results, args.threshold):
+        median = results[name]["median"] * 1000
+        change = "" if ratio is None else f"{(ratio - 1) * 100:+6.1f}%"
+        print(f"{name:14} {median:9.3f} ms {change:>8} {status}")
+        regressed = regressed or status == "regressed"
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,203 @@
+import hashlib
+import re
+
+from plugins import Plugin
+from template import compile_template
+
+COMMENT_PATTERN = re.compile(r"/\*.*?\*/", re.DOTALL)
+# Pseudo-classes, pseudo-elements and attribute selectors are dropped before
+# matching, which can only keep a rule that would not apply, never drop one.
+IGNORED_PATTERN = re.compile(r"::?[-\w]+(\([^)]*\))?|\[[^\]]*\]")
+COMBINATOR_PATTERN = re.compile(r"[\s>+~]+")
+SIMPLE_PATTERN = re.compile(r"([#.]?)([-\w]+)")
+# At-rules whose blocks hold rules of their own, pruned like the top level.
+GROUP_RULES = ("@media", "@supports")
+
+TAG_PATTERN = re.compile(r"<([a-zA-Z][a-zA-Z0-9]*)")
+CLASS_PATTERN = re.compile(r"\bclass=\"([^\"]*)\"")
+ID_PATTERN = re.compile(r"\bid=\"([^\"]*)\"")
+STYLESHEET_PATTERN = re.compile(r"<link\b[^>]*\brel=\"stylesheet\"[^>]*>")
+
+
+def parse_css(text):
+    """
+    Splits a stylesheet into its top-level statements: rules as
+    ("rule", selectors, body), grouping at-rules as ("group", prelude, statements),
+    and any other at-rule, kept as it is, as ("raw", text).
+    """
+    text = COMMENT_PATTERN.sub("", text)
+    statements = []
+    position = 0
+    while True:
+        brace = text.find("{", position)
+        semicolon = text.find(";", position)
+        if brace == -1 and semicolon == -1:
+            break
+        if semicolon != -1 and (brace == -1 or semicolon < brace):
+            # A statement at-rule such as @import or @charset
+            statement = text[position:semicolon + 1].strip()
+            if statement:
+                statements.append(("raw", statement))
+            position = semicolon + 1
+            continue
+        prelude = text[position:brace].strip()
+        end = __block_end(text, brace)
+        body = text[brace + 1:end]
+        if prelude.startswith(GROUP_RULES):
+            statements.append(("group", prelude, parse_css(body)))
+        elif prelude.startswith("@"):
+            statements.append(("raw", f"{prelude} {{{body}}}"))
+        else:
+            statements.append(("rule", [selector.strip() for selector in prelude.split(",")], body))
+        position = end + 1
+    return statements
+
+
+def __block_end(text, brace):
+    depth = 0
+    for index in range(brace, len(text)):
+        if text[index] == "{":
+            depth += 1
+        elif text[index] == "}":
+            depth -= 1
+            if depth == 0:
+                return index
+    raise ValueError("unbalanced braces in stylesheet")
+
+
+def selector_matches(selector, used):
+    """
+    Whether a selector can match a page, judged only from the tags, classes and
+    ids the page uses: every tag, class and id the selector names must be used.
+
+    :param selector: A single selector, e.g. "pre code" or "a.external:hover"
+    :param used: A set of tag names, ".class" and "#id" strings
+    """
+    for compound in COMBINATOR_PATTERN.split(IGNORED_PATTERN.sub("", selector)):
+        for prefix, name in SIMPLE_PATTERN.findall(compound):
+            token = prefix + name if prefix else name.lower()
+            if token not in used:
+                return False
+    return True
+
+
+def format_css(statements, used):
+    """
+    :return: The CSS of the statements that can match a page using `used`,
+        with the selectors that cannot match dropped from each rule
+    """
+    lines = []
+    for statement in statements:
+        if statement[0] == "rule":
+            selectors = [selector for selector in statement[1] if selector_matches(selector, used)]
+            if selectors:
+                lines.append(",\n".join(selectors) + f" {{{statement[2]}}}")
+        elif statement[0] == "group":
+            inner = format_css(statement[2], used)
+            if inner:
+                lines.append(f"{statement[1]} {{\n{inner}\n}}")
+        else:
+            lines.append(statement[1])
+    return "\n\n".join(lines)
+
+
+def template_usage(text):
+    """The tags, classes and ids written literally in a template."""
+    used = {tag.lower() for tag in TAG_PATTERN.findall(text)}
+    for classes in CLASS_PATTERN.findall(text):
+        used.update("." + name for name in classes.split())
+    used.update("#" + name for name in ID_PATTERN.findall(text))
+    return used
+
+
+def defer_stylesheets(text):
+    """
+    Rewrites the stylesheet links of a template to load without blocking the
+    first paint, keeping a plain link for browsers without JavaScript.
+    """
+    def defer(match):
+        link = match.group(0)
+        preload = link.replace("rel=\"stylesheet\"", "rel=\"preload\" as=\"style\" "
+                               "onload=\"this.onload=null;this.rel='stylesheet'\"")
+        return f"{preload}<noscript>{link}</noscript>"
+    return STYLESHEET_PATTERN.sub(defer, text)
+
+
+class UsagePlugin(Plugin):
+    """Records the tags, classes and ids of every node of a page as it is transformed."""
+    name = "css_usage"
+    tags = None
+
+    def __init__(self):
+        self.page = set()
+
+    def visit(self, node):
+        if node.tag is not None:
+            self.page.add(node.tag)
+        if node.props:
+            if "class" in node.props:
+                self.page.update("." + name for name in node.props["class"].split())
+            if "id" in node.props:
+                self.page.add("#" + node.props["id"])
+        return node
+
+
+class StyleSheets:
+    """
+    Prunes the site stylesheets down to the rules the site can use. Stylesheets
+    are read when the static files are copied but only written after every
+    page was rendered, once the tags, classes and ids used across the site are
+    known. Usage is collected by a plugin during the transform pass every page
+    tree goes through, and from the template source, so no output is parsed.
+
+    :param critical: Whether the rules each page uses are also inlined into its
+        head, with the full stylesheets loaded without blocking the first paint
+    """
+    def __init__(self, critical=False):
+        self.critical = critical
+        self.plugin = UsagePlugin()
+        self.sheets = []
+        self.used = set()
+        self.__templates = {}
+        self.__critical = {}
+        self.__hash = hashlib.sha256(f"critical={critical}".encode("utf-8"))
+
+    def add(self, from_path, to_path):
+        """Reads a stylesheet, to be written pruned to `to_path` by write()."""
+        with open(from_path, "r") as file:
+            text = file.read()
+        self.sheets.append((to_path, parse_css(text)))
+        self.__hash.update(f"\0{to_path}\0{text}".encode("utf-8"))
+
+    def digest(self):
+        """A hash of the stylesheets and the mode, which critical CSS in a page depends on."""
+        return self.__hash.hexdigest()
+
+    def page(self, template):
+        """
+        Finishes the page whose tree just went through the plugin pipeline.
+
+        :param template: The compiled Template the page is rendered into
+        :return: A tuple of (Template to render with, markup for its head)
+        """
+        if template.text not in self.__templates:
+            deferred = compile_template(defer_stylesheets(template.text)) if self.critical else template
+            self.__templates[template.text] = (deferred, template_usage(template.text))
+        deferred, used = self.__templates[template.text]
+        used = used | self.plugin.page
+        self.plugin.page = set()
+        self.used |= used
+        if not self.critical:
+            return template, ""
+        # Pages of the same kind use the same set, so their critical CSS is formatted once
+        key = frozenset(used)
+        if key not in self.__critical:
+            self.__critical[key] = "\n".join(filter(None, (format_css(statements, used) for _, statements in self.sheets)))
+        css = self.__critical[key]
+        return deferred, f"<style>{css}</style>" if css else ""
+
+    def write(self, output):
+        """Writes every stylesheet with the rules no page can use left out."""
+        for to_path, statements in self.sheets:
+            output.write_text(to_path, format_css(statements, self.used) + "\n")
+
@@ -0,0 +1,82 @@
+import json
+import os
+
+from output import read_manifest, write_manifest
+
+
+def compute_delta(previous, current):
+    """
+    Compares the files written by this build with the previous build's manifest.
+
+    :param previous: Mapping of output path to content hash from the previous build
+    :param current: Mapping of output path to content hash from this build
+    :return: A dict with "added" and "changed" mapping paths to their new hashes
+        and "removed" mapping paths to the hashes they had before
+    """
+    added = {}
+    changed = {}
+    for rel_path, digest in current.items():
+        if rel_path not in previous:
+            added[rel_path] = digest
+        elif previous[rel_path] != digest:
+            changed[rel_path] = digest
+    removed = {rel_path: digest for rel_path, digest in previous.items() if rel_path not in current}
+    return {"added": added, "changed": changed, "removed": removed}
+
+
+def load_previous_manifest(manifest_path):
+    if not os.path.exists(manifest_path):
+        return {}
+    return read_manifest(manifest_path)["files"]
+
+
+def write_delta(delta_path, delta, base_path):
+    delta["base_path"] = base_path
+    os.makedirs(os.path.dirname(delta_path), exist_ok=True)
+    with open(delta_path, "w") as file:
+        json.dump(delta, file, indent=2, sort_keys=True)
+        file.write("\n")
+
+
+def record_build(manifest_path, delta_path, manifest, base_path):
+    """
+    Writes the delta between the previous and this build and stores this
+    build's manifest as the baseline for the next one. The previous manifest
+    is kept alongside so a rollback can restore it.
+
+    :param manifest_path: Where the manifest of the live build is kept
+    :param delta_path: Where to write the delta
+    :param manifest: The manifest of the build that just went live
+    :param base_path: The base path the build was made with, so paths can be turned into URLs
+    :return: The delta that was written
+    """
+    delta = compute_delta(load_previous_manifest(manifest_path), manifest)
+    write_delta(delta_path, delta, base_path)
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    if os.path.exists(manifest_path):
+        os.replace(manifest_path, manifest_path + ".previous")
+    write_manifest(manifest_path, manifest, base_path=base_path)
+    return delta
+
+
+def rollback_manifest(manifest_path, delta_path):
+    """
+    Swaps the stored manifest with the previous one after a rollback and
+    writes the delta from the rolled back build to the one live again, so
+    the paths it changed can be purged like after a build.
+
+    :param manifest_path: Where the manifest of the live build is kept
+    :param delta_path: Where to write the delta
+    :return: The delta that was written, or None without a previous manifest
+    """
+    previous_path = manifest_path + ".previous"
+    if not os.path.exists(previous_path):
+        return None
+    current, previous = read_manifest(manifest_path), read_manifest(previous_path)
+    delta = compute_delta(current["files"], previous["files"])
+    write_delta(delta_path, delta, previous.get("base_path"))
+    swap_path = manifest_path + ".rollback"
+    os.replace(manifest_path, swap_path)
+    os.replace(previous_path, manifest_path)
+    os.replace(swap_path, previous_path)
+    return delta
@@ -0,0 +1,91 @@
+import hashlib
+import marshal
+import os
+
+from leafnode import LeafNode
+from parentnode import ParentNode
+
+
+LEAF = 0
+PARENT = 1
+
+
+def encode_node(node):
+    """
+    Flattens an HTMLNode tree into nested tuples of plain values: leaves as
+    (LEAF, tag, value, props) and parents as (PARENT, tag, props, children).
+    """
+    props = tuple(node.props.items()) if node.props else None
+    if isinstance(node, ParentNode):
+        return (PARENT, node.tag, props, tuple(encode_node(child) for child in node.children))
+    return (LEAF, node.tag, node.value, props)
+
+
+def decode_node(encoded):
+    kind, tag, middle, last = encoded
+    if kind == PARENT:
+        return ParentNode(tag, [decode_node(child) for child in last], dict(middle) if middle else None)
+    return LeafNode(tag, middle, dict(last) if last else None)
+
+
+class DocumentCache:
+    """
+    Caches parsed HTMLNode trees on disk, keyed by the hash of the Markdown
+    they were parsed from and the parser version, so a rebuild that only
+    changes the template or base path reloads trees instead of reparsing.
+    Trees are stored with marshal, which loads much faster than parsing.
+
+    :param cache_dir: The directory the cached trees are kept in
+    :param parser_version: Bumped whenever the parser output changes, which invalidates every entry
+    """
+    def __init__(self, cache_dir, parser_version):
+        self.cache_dir = cache_dir
+        self.parser_version = parser_version
+        self.hits = 0
+        self.misses = 0
+        self.used = set()
+
+    def __path(self, markdown):
+        digest = hashlib.sha256(f"{self.parser_version}\0{markdown}".encode("utf-8")).hexdigest()
+        self.used.add(digest)
+        return os.path.join(self.cache_dir, digest[:2], digest)
+
+    def get_or_parse(self, markdown, parse):
+        """
+        :param markdown: The Markdown the tree is parsed from
+        :param parse: Called to parse the Markdown on a cache miss, returning a
+            tuple of (tree, info), info being anything marshal can store that
+            was collected while parsing, like the table of contents
+        :return: A tuple of (tree, info, True if it came from the cache)
+        """
+        path = self.__path(markdown)
+        try:
+            with open(path, "rb") as file:
+                # marshal.load reads a file object in small chunks; one read is much faster.
+                encoded, info = marshal.loads(file.read())
+            node = decode_node(encoded)
+            self.hits += 1
+            return node, info, True
+        except (FileNotFoundError, EOFError, ValueError, TypeError):
+            pass
+
+        self.misses += 1
+        node, info = parse()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(marshal.dumps((encode_node(node), info)))
+        os.replace(tmp_path, path)
+        return node, info, False
+
+    def prune(self):
+        """Removes cached trees that were not used since this cache was opened."""
+        if not os.path.isdir(self.cache_dir):
+            return
+        for prefix in os.listdir(self.cache_dir):
+            prefix_dir = os.path.join(self.cache_dir, prefix)
+            for name in os.listdir(prefix_dir):
+                if name not in self.used:
+                    os.remove(os.path.join(prefix_dir, name))
+            if not os.listdir(prefix_dir):
+                os.rmdir(prefix_dir)
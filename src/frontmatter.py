@@ -0,0 +1,123 @@
+import io
+import itertools
+import re
+
+FENCE = "---"
+
+
+def __parse_scalar(text):
+    text = text.strip()
+    if len(text) >= 2 and text[0] == text[-1] and text[0] in "\"'":
+        return text[1:-1]
+    lowered = text.lower()
+    if lowered in ("true", "yes"):
+        return True
+    if lowered in ("false", "no"):
+        return False
+    if lowered in ("", "~", "null"):
+        return None
+    if re.fullmatch(r"-?\d+", text):
+        return int(text)
+    return text
+
+
+def parse_front_matter(text):
+    """
+    Parses the YAML subset used in front matter: `key: value` pairs whose
+    values are strings, quoted strings, integers, booleans or null, flow lists
+    like `tags: [a, b]` and block lists of `- item` lines under an empty key.
+    Lines starting with `#` are comments.
+
+    :param text: The lines between the opening and closing `---` fences
+    :return: A dict of the parsed keys
+    :raises ValueError: If a line is not valid in the supported subset
+    """
+    metadata = {}
+    list_key = None
+    for number, line in enumerate(text.split("\n"), start=1):
+        stripped = line.strip()
+        if stripped == "" or stripped.startswith("#"):
+            continue
+        if stripped.startswith("- ") or stripped == "-":
+            if list_key is None:
+                raise ValueError(f"front matter line {number}: list item without a key: {line}")
+            metadata[list_key].append(__parse_scalar(stripped[1:]))
+            continue
+        match = re.fullmatch(r"([A-Za-z_][\w-]*)\s*:(.*)", stripped)
+        if not match:
+            raise ValueError(f"front matter line {number}: expected key: value, got {line}")
+        key, value = match.group(1), match.group(2).strip()
+        list_key = None
+        if value == "":
+            metadata[key] = []
+            list_key = key
+        elif value.startswith("[") and value.endswith("]"):
+            items = value[1:-1].split(",")
+            metadata[key] = [__parse_scalar(item) for item in items if item.strip() != ""]
+        else:
+            metadata[key] = __parse_scalar(value)
+    return metadata
+
+
+def split_front_matter(markdown):
+    """
+    Splits a Markdown document into its front matter and body. Documents that
+    do not start with a `---` line have no front matter.
+
+    :param markdown: The whole Markdown document
+    :return: A tuple of (metadata dict, body)
+    """
+    if not markdown.startswith(FENCE + "\n"):
+        return {}, markdown
+    end = markdown.find("\n" + FENCE + "\n", len(FENCE))
+    if end == -1:
+        if markdown.endswith("\n" + FENCE):
+            end = len(markdown) - len(FENCE) - 1
+        else:
+            raise ValueError("front matter is missing its closing ---")
+    return parse_front_matter(markdown[len(FENCE) + 1:end]), markdown[end + len(FENCE) + 2:]
+
+
+def read_page_metadata(path):
+    """
+    Reads the front matter of a Markdown file without reading its body. When
+    the front matter has no title, lines are read up to the first `# ` heading
+    instead, which matches what extract_title would find.
+
+    :param path: The Markdown file
+    :return: A dict of the front matter, always containing "title" (possibly None)
+    """
+    with open(path, "r") as file:
+        return __read_metadata(file, path)
+
+
+def page_metadata(markdown, name="page"):
+    """
+    Like read_page_metadata, for a Markdown document that is not on disk.
+
+    :param markdown: The Markdown document
+    :param name: What the document is called in errors
+    """
+    return __read_metadata(io.StringIO(markdown), name)
+
+
+def __read_metadata(file, name):
+    first_line = file.readline()
+    metadata = {}
+    if first_line.rstrip("\n") == FENCE:
+        lines = []
+        for line in file:
+            if line.rstrip("\n") == FENCE:
+                break
+            lines.append(line.rstrip("\n"))
+        else:
+            raise ValueError(f"front matter of {name} is missing its closing ---")
+        metadata = parse_front_matter("\n".join(lines))
+        first_line = ""
+    if metadata.get("title") is None:
+        metadata["title"] = None
+        for line in itertools.chain([first_line], file) if first_line else file:
+            if line.startswith("# "):
+                metadata["title"] = line[2:].rstrip("\n")
+                break
+    return metadata
@@ -0,0 +1,130 @@
+import posixpath
+
+from listing import page_url
+from plugins import Plugin
+
+EXTERNAL_PREFIXES = ("http://", "https://", "//", "mailto:", "tel:", "#", "data:")
+
+
+def link_key(url, base_path, page_dir=""):
+    """
+    Normalizes an internal link to the key pages are known by in the link
+    graph: the URL relative to the base path without a trailing slash, so
+    "/site/blog/tom/", "/site/blog/tom" and "/site//blog/tom/index.html" are
+    all "blog/tom" and the home page is "".
+
+    :param url: The link as it appears in the page
+    :param base_path: The path prefix the site is served from
+    :param page_dir: The directory of the linking page, relative links are resolved against
+    :return: The key, or None for a link to another site
+    """
+    if url.startswith(EXTERNAL_PREFIXES):
+        return None
+    url = url.split("#", 1)[0].split("?", 1)[0]
+    if url.startswith(base_path):
+        url = url[len(base_path):]
+    elif url.startswith("/"):
+        url = url[1:]
+    else:
+        url = posixpath.join(page_dir, url)
+    url = posixpath.normpath("/" + url).lstrip("/")
+    if url == "index.html" or url.endswith("/index.html"):
+        url = url[:-len("index.html")]
+    return url.rstrip("/")
+
+
+def is_page_key(key):
+    """Whether a link key names a page rather than an image or another file."""
+    name = key.rsplit("/", 1)[-1]
+    return "." not in name or name.endswith(".html")
+
+
+class LinkPlugin(Plugin):
+    """Records the links and images of a page, in document order, as it is transformed."""
+    name = "links"
+    tags = ("a", "img")
+
+    def __init__(self):
+        self.links = []
+        self.images = []
+
+    def visit(self, node):
+        if node.props:
+            if node.tag == "a" and "href" in node.props:
+                self.links.append(node.props["href"])
+            elif node.tag == "img" and "src" in node.props:
+                self.images.append(node.props["src"])
+        return node
+
+
+class PrefetchHints:
+    """
+    Adds resource hints to the head of every page: a preload for the images
+    at the top of the page and prefetches for the pages it links to that the
+    rest of the site links to most, those being the likeliest next pages.
+
+    The site link graph lives in the metadata index and is loaded once per
+    build, with the number of pages linking to each page. The links of a page
+    are collected by a plugin during the transform pass its tree already goes
+    through and replace its edges in the graph as it is rendered, so the
+    graph is kept up to date incrementally without looking at the output.
+    Pages are ranked by the links recorded so far, which includes every page
+    of the previous build. The pages whose links changed are written back in
+    one go by save().
+
+    :param index: The MetadataIndex the graph is kept in
+    :param base_path: The path prefix the site is served from
+    :param budget: The most hints added to a page
+    :param images: The most of those hints spent on preloading images
+    """
+    def __init__(self, index, base_path, budget, images=1):
+        self.index = index
+        self.base_path = base_path
+        self.budget = budget
+        self.images = images
+        self.plugin = LinkPlugin()
+        self.links = index.links()
+        self.degrees = index.in_degrees()
+        self.changed = {}
+
+    def skip(self):
+        """Forgets the links collected from a tree that is not a page of the graph, like a listing."""
+        self.plugin.links, self.plugin.images = [], []
+
+    def page(self, source, path):
+        """
+        Finishes the page whose tree just went through the plugin pipeline.
+
+        :param source: The key of the page in the metadata index
+        :param path: The output path of the page, relative to the output root
+        :return: The hint markup for the head of the page
+        """
+        links, images = self.plugin.links, self.plugin.images
+        self.skip()
+
+        own_key = link_key(page_url(path), "")
+        page_dir = posixpath.dirname(path)
+        targets = {}
+        for href in links:
+            key = link_key(href, self.base_path, page_dir)
+            if key is not None and key != own_key and is_page_key(key) and key not in targets:
+                targets[key] = href
+        keys = list(targets)
+        previous = self.links.get(source, [])
+        if keys != previous:
+            for key in set(previous) - targets.keys():
+                self.degrees[key] -= 1
+            for key in targets.keys() - set(previous):
+                self.degrees[key] = self.degrees.get(key, 0) + 1
+            self.links[source] = self.changed[source] = keys
+
+        hints = [f'<link rel="preload" as="image" href="{src}">' for src in images[:min(self.images, self.budget)]]
+        # Most linked first; the earlier link on the page wins a tie
+        ranked = sorted(targets, key=lambda key: -self.degrees[key])
+        hints += [f'<link rel="prefetch" href="{targets[key]}">' for key in ranked[:self.budget - len(hints)]]
+        return "".join(hints)
+
+    def save(self):
+        """Writes the links of the pages whose links changed to the metadata index."""
+        self.index.set_links(self.changed)
+        self.changed = {}
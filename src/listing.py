@@ -0,0 +1,152 @@
+import hashlib
+import json
+import re
+
+from leafnode import LeafNode
+from parentnode import ParentNode
+
+
+def page_url(path):
+    """
+    Turns an output path into the URL the page is linked with, relative to the
+    base path: "blog/tom/index.html" becomes "blog/tom/".
+    """
+    if path == "index.html":
+        return ""
+    if path.endswith("/index.html"):
+        return path[:-len("index.html")]
+    return path
+
+
+def slugify_tag(tag):
+    return re.sub(r"[^a-z0-9]+", "-", tag.lower()).strip("-") or "tag"
+
+
+def tag_slugs(tags):
+    """
+    Gives every tag a unique slug for the URL of its listing. When tags share
+    a slug, like "C++" and "C#", all but the first in sorted order get a short
+    hash of the tag appended, so the slug of a tag only depends on the tags it
+    collides with.
+
+    :param tags: The tags of a section
+    :return: A dict mapping every tag to its slug
+    """
+    slugs = {}
+    used = set()
+    for tag in sorted(tags):
+        slug = slugify_tag(tag)
+        if slug in used:
+            slug += "-" + hashlib.sha256(tag.encode("utf-8")).hexdigest()[:8]
+        used.add(slug)
+        slugs[tag] = slug
+    return slugs
+
+
+class ListingPage:
+    """
+    One generated listing page: a title and the pages it links to, plus links
+    to its neighbours when the listing is paginated.
+
+    :param path: The output path of the listing page
+    :param title: The page title
+    :param groups: A list of (heading, entries) tuples; heading may be None and
+        every entry is a (url, title, date) tuple
+    :param previous_url: The URL of the previous page of the listing, if any
+    :param next_url: The URL of the next page of the listing, if any
+    """
+    def __init__(self, path, title, groups, previous_url=None, next_url=None):
+        self.path = path
+        self.title = title
+        self.groups = groups
+        self.previous_url = previous_url
+        self.next_url = next_url
+
+    def digest(self, *extra):
+        """
+        A hash of everything the rendered page depends on. It only changes
+        when the member set or ordering of the page changes, or when one of
+        the extra values (template, base path) does.
+        """
+        state = [self.path, self.title, self.groups, self.previous_url, self.next_url, extra]
+        return hashlib.sha256(json.dumps(state).encode("utf-8")).hexdigest()
+
+    def to_html_node(self):
+        children = [LeafNode("h1", self.title)]
+        for heading, entries in self.groups:
+            if heading is not None:
+                children.append(LeafNode("h2", heading))
+            items = []
+            for url, title, date in entries:
+                item = [LeafNode("a", title, {"href": "{{basepath}}" + url})]
+                if date:
+                    item.append(LeafNode(None, f" ({date})"))
+                items.append(ParentNode("li", item))
+            children.append(ParentNode("ul", items))
+        links = []
+        if self.previous_url is not None:
+            links.append(LeafNode("a", "Newer posts", {"href": "{{basepath}}" + self.previous_url}))
+        if self.next_url is not None:
+            if links:
+                links.append(LeafNode(None, " | "))
+            links.append(LeafNode("a", "Older posts", {"href": "{{basepath}}" + self.next_url}))
+        if links:
+            children.append(ParentNode("p", links))
+        return ParentNode("div", children)
+
+
+def __entry(page):
+    return page_url(page["path"]), page["title"] or page_url(page["path"]), page["date"]
+
+
+def __paginate(base_dir, title, entries, page_size):
+    chunks = [entries[start:start + page_size] for start in range(0, len(entries), page_size)] or [[]]
+
+    def url(number):
+        return base_dir + "/" if number == 1 else f"{base_dir}/page/{number}/"
+
+    listing_pages = []
+    for number, chunk in enumerate(chunks, start=1):
+        listing_pages.append(ListingPage(
+            url(number) + "index.html",
+            title if number == 1 else f"{title}, page {number}",
+            [(None, chunk)],
+            url(number - 1) if number > 1 else None,
+            url(number + 1) if number < len(chunks) else None,
+        ))
+    return listing_pages
+
+
+def listing_pages(index, section, page_size, include_drafts=False, tags=None):
+    """
+    Describes every listing page of a section from the metadata index: the
+    paginated section index, a paginated listing per tag and an archive
+    grouped by year. No Markdown is read.
+
+    :param index: The MetadataIndex of the site
+    :param section: The content directory to list, e.g. "blog"
+    :param page_size: The number of entries per listing page
+    :param include_drafts: Whether drafts are listed
+    :param tags: Only describe the listings of these tags, by default of all of them
+    :return: A list of ListingPage objects
+    """
+    prefix = section + "/"
+    pages = index.pages(prefix, include_drafts)
+    entries = [__entry(page) for page in pages]
+    section_title = section.replace("-", " ").title()
+
+    listings = __paginate(section, section_title, entries, page_size)
+    for tag, slug in tag_slugs(index.tags(prefix, include_drafts)).items():
+        if tags is not None and tag not in tags:
+            continue
+        tag_entries = [__entry(page) for page in index.pages(prefix, include_drafts, tag)]
+        listings.extend(__paginate(f"{section}/tags/{slug}", f"Tagged \"{tag}\"", tag_entries, page_size))
+
+    groups = []
+    for entry in entries:
+        year = entry[2][:4] if entry[2] else "Undated"
+        if not groups or groups[-1][0] != year:
+            groups.append((year, []))
+        groups[-1][1].append(entry)
+    listings.append(ListingPage(f"{section}/archive/index.html", f"{section_title} archive", groups))
+    return listings
@@ -0,0 +1,49 @@
+import threading
+from collections import OrderedDict
+
+MISSING = object()
+
+
+class LRUCache:
+    """
+    A thread-safe least-recently-used cache that counts its hits and misses.
+
+    :param max_size: The number of entries kept before the least recently used is evicted
+    """
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.__lock:
+            if key in self.__entries:
+                self.__entries.move_to_end(key)
+                self.hits += 1
+                return self.__entries[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self.__lock:
+            self.__entries[key] = value
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.max_size:
+                self.__entries.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        """
+        Returns the cached value for key, computing and caching it on a miss.
+        The computation runs outside the lock, so concurrent misses on the same
+        key may both compute it.
+        """
+        value = self.get(key, MISSING)
+        if value is MISSING:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def __len__(self):
+        return len(self.__entries)
@@ -1,12 +1,31 @@
+import argparse
+import json
 import re
-import shutil
 import os
 import sys
+import threading
+import time
 from multiprocessing.pool import worker
 
 from leafnode import LeafNode
 from textnode import TextType, TextNode
 from parentnode import ParentNode
+from assets import AssetCopier, HashCache
+from css import StyleSheets
+from delta import record_build, rollback_manifest
+from doccache import DocumentCache
+from frontmatter import split_front_matter
+from linkgraph import PrefetchHints
+from listing import listing_pages, slugify_tag, tag_slugs
+from metadata import MetadataIndex
+from plugins import PLUGINS, make_pipeline
+from report import BuildReport
+from output import ArchiveOutput, DirectoryOutput, hash_bytes, relative_output_path, write_manifest
+from shard import SHARD_MANIFEST, merge_shards, parse_shard, shard_of
+from sitemap import Sitemap, write_feed
+from stages import PageStages
+from staging import SWAP_MODES, abort_staging, begin_staging, commit_staging, rollback, swap_mode
+from template import load_template
 from enum import Enum
 
 class BlockType(Enum):
@@ -20,22 +39,72 @@ class BlockType(Enum):
     BLOCKQUOTE = "blockquote"
 
 
-def __internal_extract_images_or_links(text, regex):
+# Bump whenever a change makes the parser produce different HTMLNode trees, so
+# trees cached by an older parser are not reused.
+PARSER_VERSION = 3
+
+
+def __internal_find_images_or_links(text, opener):
     """
-    Use the regex to extract images or links from the text.
-    :param text: The text to extract images or links from
-    :param regex: The regex to use to extract images or links
-    :return: returns a list of tuples containing alt text and url
+    Finds Markdown images or links in a single forward scan. The spans found
+    are the ones the regex `\\[[^]]*]\\([^)]*\\)` (prefixed with `!` for images)
+    would find, leftmost first and without overlaps, but without the regex
+    engine's quadratic backtracking on long runs of `[` or `!`.
+
+    Every opener between a failed opener and its closing `]` would fail on the
+    same `]`, so the scan resumes after it, and once there is no `]` or `)`
+    left there can be no further matches.
+
+    :param text: The text to scan
+    :param opener: "![" for images, "[" for links
+    :return: A list of (start, end, alt text, url) tuples
     """
-    return re.findall(regex, text)
+    matches = []
+    position = 0
+    while True:
+        start = text.find(opener, position)
+        if start == -1:
+            break
+        alt_start = start + len(opener)
+        close = text.find("]", alt_start)
+        if close == -1:
+            break
+        if not text.startswith("(", close + 1):
+            position = close + 1
+            continue
+        end = text.find(")", close + 2)
+        if end == -1:
+            break
+        matches.append((start, end + 1, text[alt_start:close], text[close + 2:end]))
+        position = end + 1
+    return matches
 
 
 def extract_markdown_images(text):
-    return __internal_extract_images_or_links(text, r"!\[([^\]]*)\]\(([^)]*)\)")
+    return [(alt, url) for _, _, alt, url in __internal_find_images_or_links(text, "![")]
 
 
 def extract_markdown_links(text):
-    return __internal_extract_images_or_links(text, r"\[([^\]]*)\]\(([^)]*)\)")
+    return [(alt, url) for _, _, alt, url in __internal_find_images_or_links(text, "[")]
+
+
+def __internal_split_images_or_links(old_nodes, opener, text_type):
+    new_nodes = []
+    for old_node in old_nodes:
+        if old_node.text_type != TextType.TEXT:
+            new_nodes.append(old_node)
+            continue
+
+        position = 0
+        for start, end, alt, url in __internal_find_images_or_links(old_node.text, opener):
+            if start > position:
+                new_nodes.append(TextNode(old_node.text[position:start], TextType.TEXT))
+            new_nodes.append(TextNode(alt, text_type, url))
+            position = end
+        if position < len(old_node.text):
+            new_nodes.append(TextNode(old_node.text[position:], TextType.TEXT))
+
+    return new_nodes
 
 
 def split_nodes_image(old_nodes):
@@ -55,23 +124,7 @@ def split_nodes_image(old_nodes):
         image nodes with their respective URLs and alternative texts.
     :rtype: list
     """
-    new_nodes = []
-    for old_node in old_nodes:
-        if old_node.text_type != TextType.TEXT:
-            new_nodes.append(old_node)
-            continue
-            
-        new_text, _ = re.subn(r"(!\[[^]]*]\([^)]*\))", "-*-"+r"\1"+"-*-", old_node.text)
-        split_text = new_text.split("-*-")
-        for index in range(len(split_text)):
-            if index % 2 == 0:
-                if "" != split_text[index]:
-                    new_nodes.append(TextNode(split_text[index], TextType.TEXT))
-            else:
-                url = extract_markdown_images(split_text[index])
-                new_nodes.append(TextNode(url[0][0], TextType.IMAGE, url[0][1]))
-       
-    return new_nodes
+    return __internal_split_images_or_links(old_nodes, "![", TextType.IMAGE)
 
 def split_nodes_link(old_nodes):
     """
@@ -87,23 +140,7 @@ def split_nodes_link(old_nodes):
              split into individual link nodes, and the other text is represented as text nodes.
     :rtype: list[TextNode]
     """
-    new_nodes = []
-    for old_node in old_nodes:
-        if old_node.text_type != TextType.TEXT:
-            new_nodes.append(old_node)
-            continue
-            
-        new_text, _ = re.subn(r"(\[[^]]*]\([^)]*\))", "-*-"+r"\1"+"-*-", old_node.text)
-        split_text = new_text.split("-*-")
-        for index in range(len(split_text)):
-            if index % 2 == 0:
-                if "" != split_text[index]:
-                    new_nodes.append(TextNode(split_text[index], TextType.TEXT))
-            else:
-                url = extract_markdown_links(split_text[index])
-                new_nodes.append(TextNode(url[0][0], TextType.LINK, url[0][1]))
-
-    return new_nodes
+    return __internal_split_images_or_links(old_nodes, "[", TextType.LINK)
 
 
 def split_nodes_delimiter(old_nodes, delimiter, text_type):
@@ -132,36 +169,64 @@ def split_nodes_delimiter(old_nodes, delimiter, text_type):
     # This handles cases like **kwargs and _ in Python code
     new_nodes = []
     for node in old_nodes:
-        # check if there is a pair of delimiter characters
-        if node.text.count(delimiter) % 2 != 0:
-            raise Exception(f"missing delimiter {delimiter} in {node.text}")
-
         # Skip processing if the node is not a TEXT type
         if node.text_type != TextType.TEXT:
             new_nodes.append(node)
-        else:
-            # Split text into chunks using the delimiter
-            chunks = node.text.split(delimiter)
-            for index in range(0, len(chunks)):
-                # Even indices are regular text, odd indices are formatted text
-                if index % 2 == 0:
-                    if "" != chunks[index]:
-                        new_nodes.append(TextNode(chunks[index], TextType.TEXT))
-                else:
-                    new_nodes.append(TextNode(chunks[index], text_type))
+            continue
+
+        # Split text into chunks using the delimiter, a single pass over the text.
+        # An odd number of delimiters leaves an even number of chunks.
+        chunks = node.text.split(delimiter)
+        if len(chunks) % 2 == 0:
+            raise Exception(f"missing delimiter {delimiter} in {node.text}")
+        for index in range(0, len(chunks)):
+            # Even indices are regular text, odd indices are formatted text
+            if index % 2 == 0:
+                if "" != chunks[index]:
+                    new_nodes.append(TextNode(chunks[index], TextType.TEXT))
+            else:
+                new_nodes.append(TextNode(chunks[index], text_type))
 
     return new_nodes
 
 
 def heading_text_to_heading_leafnode(text_node):
-    # Count the #s then make a leafnode by splitting off the #s
-    heading_level = text_node.text.count("#")
+    # Count the leading #s then make a leafnode by splitting them off; #s later in the text are content
+    heading_level = len(text_node.text) - len(text_node.text.lstrip("#"))
     if heading_level > 6:
         raise Exception("heading level must be <= 6")
-    heading_text = text_node.text.replace("#" * heading_level, "").strip()
+    heading_text = text_node.text[heading_level:].strip()
     return LeafNode("h" + str(heading_level), heading_text)
 
 
+HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+SLUG_PATTERN = re.compile(r"[\W_]+")
+
+
+def slugify_heading(text):
+    return SLUG_PATTERN.sub("-", text.lower()).strip("-") or "section"
+
+
+def unique_slug(text, seen):
+    """
+    Makes a heading id unique within its page the way GitHub does, numbering
+    repeats "intro", "intro-1", "intro-2". `seen` maps every id handed out to
+    the next number to try for it, so repeated headings stay constant time.
+
+    :param text: The heading text
+    :param seen: The dict of ids already used on the page, updated in place
+    """
+    slug = slugify_heading(text)
+    if slug in seen:
+        number = seen[slug]
+        while f"{slug}-{number}" in seen:
+            number += 1
+        seen[slug] = number + 1
+        slug = f"{slug}-{number}"
+    seen[slug] = 1
+    return slug
+
+
 def code_block_to_code_parent_node(text_node):
     split_text = text_node.text.split("```")
     if len(split_text) != 3:
@@ -217,6 +282,10 @@ def text_node_to_html_node(text_node):
     else:
         raise Exception("unknown text type")
 
+# The number of blocks and TextNodes parsed so far, per thread, for build reports
+parse_counts = threading.local()
+
+
 def text_to_text_nodes(text):
     # split text by code, bold, and italic
     nodes = [TextNode(text, TextType.TEXT)]
@@ -225,6 +294,7 @@ def text_to_text_nodes(text):
     nodes = split_nodes_delimiter(nodes, "_", TextType.ITALIC)
     nodes = split_nodes_image(nodes)
     nodes = split_nodes_link(nodes)
+    parse_counts.text_nodes = getattr(parse_counts, "text_nodes", 0) + len(nodes)
     return nodes
 
 def markdown_to_blocks(markdown):
@@ -314,57 +384,168 @@ def build_block_quote_children(block):
     # return html_nodes
         
 
-def markdown_to_html_node(markdown):
+def block_to_html_nodes(block):
+    # turn one Markdown block into the HTML nodes it renders to, based on its block type
+    block_type = block_to_block_type(block)
+    if block_type == BlockType.HEADING:
+        heading_node = text_to_text_nodes(block)[0]
+        heading_node.text_type = TextType.HEADING
+        return [text_node_to_html_node(heading_node)]
+    elif block_type == BlockType.CODE:
+        code_node = text_to_text_nodes(block)[0]
+        code_node.text_type = TextType.CODE
+        return [text_node_to_html_node(code_node)]
+    elif block_type == BlockType.CODE_BLOCK:
+        code_block_node = text_code_block_to_text_node(block)
+        code_block_node.text_type = TextType.CODE
+        return [code_block_to_code_parent_node(code_block_node)]
+    elif block_type == BlockType.QUOTE:
+        quote_node = text_to_text_nodes(block)[0]
+        quote_node.text_type = TextType.QUOTE
+        return [text_node_to_html_node(quote_node)]
+    elif block_type == BlockType.UNORDERED_LIST:
+        child_nodes = build_list_node_children(block)
+        return [ParentNode("ul", child_nodes)]
+    elif block_type == BlockType.ORDERED_LIST:
+        child_nodes = build_list_node_children(block)
+        return [ParentNode("ol", child_nodes)]
+    elif block_type == BlockType.BLOCKQUOTE:
+        return build_block_quote_children(block)
+    else:
+        child_nodes = build_paragraph_children(block)
+        return [ParentNode("p", child_nodes)]
+
+
+def markdown_to_html_node(markdown, render_block=block_to_html_nodes, toc=None):
+    """
+    Converts a Markdown document into a div holding the HTML nodes of its blocks.
+    Headings are given ids unique within the document as the blocks are rendered.
+
+    :param markdown: The Markdown document
+    :param render_block: Turns one block into a list of HTML nodes; callers
+        that cache rendered blocks pass their own
+    :param toc: An optional list a (level, id, text) tuple is appended to for every heading
+    :return: A ParentNode for the whole document
+    """
     # make Markdown to blocks and then blocks to types and finally block types to HTML leaf nodes
     md_blocks = markdown_to_blocks(markdown)
+    parse_counts.blocks = getattr(parse_counts, "blocks", 0) + len(md_blocks)
     html_nodes = []
+    slugs = {}
     for index in range(len(md_blocks)):
-        block = md_blocks[index]
-        block_type = block_to_block_type(block)
-        if block_type == BlockType.HEADING:
-            heading_node = text_to_text_nodes(block)[0]
-            heading_node.text_type = TextType.HEADING
-            html_nodes.append(text_node_to_html_node(heading_node))
-        elif block_type == BlockType.CODE:
-            code_node = text_to_text_nodes(block)[0]
-            code_node.text_type = TextType.CODE
-            html_nodes.append(text_node_to_html_node(code_node))
-        elif block_type == BlockType.CODE_BLOCK:
-            code_block_node = text_code_block_to_text_node(block)
-            code_block_node.text_type = TextType.CODE
-            html_nodes.append(code_block_to_code_parent_node(code_block_node))
-        elif block_type == BlockType.QUOTE:
-            quote_node = text_to_text_nodes(block)[0]
-            quote_node.text_type = TextType.QUOTE
-            html_nodes.append(text_node_to_html_node(quote_node))
-        elif block_type == BlockType.UNORDERED_LIST:
-            child_nodes = build_list_node_children(block)
-            html_nodes.append(ParentNode("ul", child_nodes))
-        elif block_type == BlockType.ORDERED_LIST:
-            child_nodes = build_list_node_children(block)
-            html_nodes.append(ParentNode("ol", child_nodes))
-        elif block_type == BlockType.BLOCKQUOTE:
-            html_nodes.extend(build_block_quote_children(block))      
-        elif block_type == BlockType.PARAGRAPH:
-            child_nodes = build_paragraph_children(block)
-            html_nodes.append(ParentNode("p", child_nodes))            
-            
+        for node in render_block(md_blocks[index]):
+            if node.tag in HEADING_TAGS:
+                # A new node rather than setting props, since rendered blocks may be cached
+                slug = unique_slug(node.value, slugs)
+                node = LeafNode(node.tag, node.value, {"id": slug})
+                if toc is not None:
+                    toc.append((int(node.tag[1]), slug, node.value))
+            html_nodes.append(node)
+
     parent_node = ParentNode("div", html_nodes)
     return parent_node
 
 
-def copy_static_to_public(src_dir, dst_dir, dirs_only=False):
-    if not os.path.exists(dst_dir):
-        os.mkdir(dst_dir)
-        
-    src_stuff = os.listdir(src_dir)
+def toc_to_html_node(toc, min_level=2):
+    """
+    Builds the nested list of links of a table of contents. The page title,
+    a level 1 heading, is left out by default.
+
+    :param toc: The (level, id, text) tuples collected by markdown_to_html_node
+    :param min_level: The highest heading level listed
+    :return: A "ul" ParentNode, or None when there is no heading to list
+    """
+    items = []
+    # Every open list with the level of the headings in it; the root list is level 0
+    stack = [(0, items)]
+    for level, slug, text in toc:
+        if level < min_level:
+            continue
+        while stack[-1][0] >= level:
+            stack.pop()
+        children = []
+        stack[-1][1].append((LeafNode("a", text, {"href": "#" + slug}), children))
+        stack.append((level, children))
+
+    def to_list(entries):
+        return ParentNode("ul", [ParentNode("li", [link, to_list(children)] if children else [link])
+                                 for link, children in entries])
+    return to_list(items) if items else None
+
+
+class BuildContext:
+    """
+    Build-wide state shared by the page and asset generators.
+
+    :param output: The output backend files are written through
+    :param source_root: The directory source paths are made relative to when sharding
+    :param shard: An optional (index, count) tuple restricting the build to one shard
+    :param index: An optional MetadataIndex kept up to date with every page crawled
+    :param content_dir: The content directory, which index keys are relative to
+    :param drafts: Whether pages marked as drafts are rendered
+    :param doc_cache: An optional DocumentCache of parsed pages
+    :param pipeline: An optional plugin Pipeline every page tree is run through
+    :param styles: Optional StyleSheets, which stylesheets are handed to instead of being copied
+    :param report: An optional BuildReport every generated page is added to
+    :param assets: An optional AssetCopier, which other files are handed to instead of being copied
+    :param prefetch: Optional PrefetchHints, whose plugin must be in the pipeline, adding hints to every page
+    :param sitemap: An optional Sitemap every generated page is added to
+    """
+    def __init__(self, output, source_root=None, shard=None, index=None, content_dir=None, drafts=False,
+                 doc_cache=None, pipeline=None, styles=None, report=None, assets=None, prefetch=None,
+                 sitemap=None):
+        self.output = output
+        self.source_root = source_root
+        self.shard = shard
+        self.index = index
+        self.content_dir = content_dir
+        self.drafts = drafts
+        self.doc_cache = doc_cache
+        self.pipeline = pipeline
+        self.styles = styles
+        self.report = report
+        self.assets = assets
+        self.prefetch = prefetch
+        self.sitemap = sitemap
+
+    def in_shard(self, source_path):
+        return self.owns(os.path.relpath(source_path, self.source_root))
+
+    def owns(self, key):
+        """Whether this build is responsible for the file with the given shard key."""
+        if self.shard is None:
+            return True
+        index, count = self.shard
+        return shard_of(key, count) == index
+
+
+def copy_static_to_public(src_dir, dst_dir, dirs_only=False, context=None, skip_markdown=False):
+    """
+    Mirrors a directory into the output.
+
+    :param dirs_only: Only create the directories
+    :param skip_markdown: Leave out Markdown files, which are rendered into pages instead
+    """
+    if context is None:
+        context = BuildContext(DirectoryOutput(dst_dir))
+    context.output.make_dirs(dst_dir)
+
+    src_stuff = sorted(os.listdir(src_dir))
     for src_file in src_stuff:
         src_file_path = os.path.join(src_dir, src_file)
         if os.path.isdir(src_file_path):
-            copy_static_to_public(src_file_path, os.path.join(dst_dir, src_file), dirs_only)
+            copy_static_to_public(src_file_path, os.path.join(dst_dir, src_file), dirs_only, context, skip_markdown)
         else:
-            if not dirs_only:
-                shutil.copy(src_file_path, dst_dir)
+            if dirs_only or (skip_markdown and src_file.endswith(".md")):
+                continue
+            if context.in_shard(src_file_path):
+                if context.styles is not None and src_file.endswith(".css"):
+                    # Written once every page is rendered and the rules they use are known
+                    context.styles.add(src_file_path, os.path.join(dst_dir, src_file))
+                elif context.assets is not None:
+                    context.assets.add(src_file_path, os.path.join(dst_dir, src_file))
+                else:
+                    context.output.copy_file(src_file_path, os.path.join(dst_dir, src_file))
             
 
 def extract_title(markdown):
@@ -375,54 +556,433 @@ def extract_title(markdown):
         
     raise Exception("no title found")
 
-def generate_page(from_path, template_path, to_path, base_path):
-    print(f"Generating page from {from_path} to {to_path} using {template_path}")
-    
+def generate_page(from_path, template_path, to_path, base_path, context=None):
+    if context is None:
+        context = BuildContext(DirectoryOutput(os.path.dirname(to_path)))
+    data = render_source(from_path, read_source(from_path), template_path, to_path, base_path, context)
+    if data is not None:
+        context.output.write_bytes(to_path, data)
+
+
+def read_source(from_path):
+    """:return: A tuple of (the text of a source file, its size in bytes)"""
     with open(from_path, "r") as from_file:
-        markdown = from_file.read()
-        
-    html_node = markdown_to_html_node(markdown)
-    title = extract_title(markdown)
-    
-    with open(template_path, "r") as template_file:
-        template = template_file.read()
-        
-    page = template.replace("{{ Title }}", title).replace("{{ Content }}", html_node.to_html()).replace("{{basepath}}", base_path)
-    with open(to_path, "w") as to_file:
-        to_file.write(page)
+        return from_file.read(), os.fstat(from_file.fileno()).st_size
+
+
+def render_source(from_path, source, template_path, to_path, base_path, context):
+    """
+    Renders a page from its source without writing it.
+
+    :param source: The (text, size) tuple read_source returned
+    :return: The rendered page as bytes, or None for a skipped draft
+    """
+    print(f"Generating page from {from_path} to {to_path} using {template_path}")
+    markdown, source_bytes = source
+
+    metadata, markdown = split_front_matter(markdown)
+    if metadata.get("draft") and not context.drafts:
+        print(f"Skipping draft {from_path}")
+        return None
+    if metadata.get("template"):
+        template_path = os.path.join(os.path.dirname(template_path), metadata["template"])
+
+    path = relative_output_path(to_path, context.output.root)
+    hints = None
+    if context.prefetch is not None:
+        source_key = relative_output_path(from_path, context.content_dir)
+        hints = lambda: context.prefetch.page(source_key, path)
+    stats = {} if context.report is not None else None
+    page = render_page(metadata, markdown, load_template(template_path), base_path, doc_cache=context.doc_cache,
+                       pipeline=context.pipeline, styles=context.styles, stats=stats, hints=hints)
+    data = page.encode("utf-8")
+    if context.report is not None:
+        context.report.add(path, source_bytes, len(data), stats)
+    if context.sitemap is not None:
+        context.sitemap.add(path, os.stat(from_path).st_mtime_ns)
+    return data
+
+
+def generate_pages_staged(jobs, base_path, context, writers):
+    """
+    Generates pages like generate_page, but reads, renders and writes them in
+    overlapping stages, see PageStages.
+
+    :param jobs: (from_path, template_path, to_path) tuples, in the order the pages are rendered
+    :param writers: The number of writer threads
+    """
+    def render(job, source):
+        from_path, template_path, to_path = job
+        data = render_source(from_path, source, template_path, to_path, base_path, context)
+        return (to_path, data) if data is not None else None
+
+    PageStages(context.output, writers).run(jobs, lambda job: read_source(job[0]), render)
+
+
+def render_page(metadata, markdown, template, base_path, render_block=block_to_html_nodes, doc_cache=None,
+                pipeline=None, styles=None, stats=None, hints=None):
+    """
+    Renders the body of a Markdown page, with its front matter already split
+    off, into a compiled template.
+
+    :param metadata: The page front matter
+    :param markdown: The Markdown body
+    :param template: The compiled Template to render into
+    :param base_path: The path prefix the site is served from
+    :param render_block: Passed on to markdown_to_html_node
+    :param doc_cache: An optional DocumentCache to load the parsed tree from
+    :param pipeline: The plugin Pipeline the tree is run through before it is
+        serialized; by default only the base path is applied
+    :param styles: Optional StyleSheets, whose usage plugin must be in the pipeline
+    :param stats: An optional dict filled in with the block, TextNode and
+        HTMLNode counts of the page, its parse and render times and its
+        document cache status, for a BuildReport
+    :param hints: An optional function returning extra markup for the head of
+        the page, called once the tree went through the pipeline
+    :return: The rendered page
+    """
+    def parse():
+        toc = []
+        blocks, text_nodes = getattr(parse_counts, "blocks", 0), getattr(parse_counts, "text_nodes", 0)
+        html_node = markdown_to_html_node(markdown, render_block, toc)
+        # Everything a cached tree needs besides the tree itself
+        info = {"toc": toc, "blocks": parse_counts.blocks - blocks,
+                "text_nodes": getattr(parse_counts, "text_nodes", 0) - text_nodes}
+        return html_node, info
+
+    start = time.perf_counter()
+    if doc_cache is not None:
+        html_node, info, cached = doc_cache.get_or_parse(markdown, parse)
+    else:
+        (html_node, info), cached = parse(), None
+    parsed = time.perf_counter()
+    toc = info["toc"]
+    pipeline = pipeline or make_pipeline(base_path)
+    nodes = pipeline.nodes
+    html_node = pipeline.run(html_node)
+    html_nodes = pipeline.nodes - nodes
+    toc_html = ""
+    if template.has_toc:
+        toc_node = toc_to_html_node(toc)
+        toc_html = pipeline.run(toc_node).to_html() if toc_node is not None else ""
+    head = ""
+    if styles is not None:
+        template, head = styles.page(template)
+    if hints is not None:
+        head += hints()
+    title = metadata.get("title") or extract_title(markdown)
+    page = template.render(title, html_node.to_html(), base_path, head, toc_html)
+    if stats is not None:
+        stats.update(blocks=info["blocks"], text_nodes=info["text_nodes"], html_nodes=html_nodes,
+                     parse_seconds=parsed - start, render_seconds=time.perf_counter() - parsed,
+                     cache={True: "hit", False: "miss", None: "off"}[cached])
+    return page
         
-def generate_pages_recursive(dir_path_content, template_path, dest_dir_path, base_path):
+def generate_pages_recursive(dir_path_content, template_path, dest_dir_path, base_path, context=None, jobs=None):
+    """
+    Generates a page for every Markdown file under a content directory.
+
+    :param jobs: An optional list the (from_path, template_path, to_path) of
+        every page is appended to instead of generating it
+    """
     print(f"Crawling {dir_path_content} searching for Markdown files")
-    source_files = os.listdir(dir_path_content)
+    source_files = sorted(os.listdir(dir_path_content))
     for source_file in source_files:
         source_file_path = os.path.join(dir_path_content, source_file)
         if os.path.isdir(source_file_path):
-            generate_pages_recursive(source_file_path, template_path, os.path.join(dest_dir_path, source_file), base_path)
+            generate_pages_recursive(source_file_path, template_path, os.path.join(dest_dir_path, source_file), base_path, context, jobs)
         else:
             if source_file.endswith(".md"):
                 from_path = os.path.join(dir_path_content, source_file)
                 to_path = os.path.join(dest_dir_path, source_file[:-3] + ".html")
-                generate_page(from_path, template_path, to_path, base_path)
+                if context is not None and context.index is not None:
+                    # Every shard indexes every page so that site-wide pages see the whole site.
+                    context.index.refresh(from_path, relative_output_path(from_path, context.content_dir),
+                                          relative_output_path(to_path, context.output.root))
+                if context is not None and not context.in_shard(from_path):
+                    continue
+                if jobs is not None:
+                    jobs.append((from_path, template_path, to_path))
+                else:
+                    generate_page(from_path, template_path, to_path, base_path, context)
 
 
-def main():
-    base_path = "/"
+def __keep_listings(recorded, dest_dir_path, context):
+    """
+    Keeps listing pages rendered by a previous build as they are.
+
+    :param recorded: A dict mapping listing page paths to their recorded (digest, output hash)
+    :return: The kept pages the way generate_listings returns them, or None
+        when there are none or one of them cannot be kept
+    """
+    if not recorded:
+        return None
+    for path, (_, output_hash) in recorded.items():
+        if context.index.has_path(path) or not context.output.keep(os.path.join(dest_dir_path, path), output_hash):
+            return None
+    return recorded
 
-    if len(sys.argv) != 2:
-        base_path = "/"
-    
-    base_path = sys.argv[1]
-    work_dir = os.getcwd()
-    src_dir = os.path.join(work_dir, "static")
-    dst_dir = os.path.join(work_dir, "docs")
-    shutil.rmtree(dst_dir, ignore_errors=True)
-    copy_static_to_public(src_dir, dst_dir)
-    
-    src_dir = os.path.join(work_dir, "content")
-    dst_dir = os.path.join(work_dir, "docs")
-    copy_static_to_public(src_dir, dst_dir, True)
 
-    generate_pages_recursive(src_dir, os.path.join(work_dir, "template.html"), dst_dir, base_path)
+def generate_listings(template_path, dest_dir_path, base_path, section, page_size, context):
+    """
+    Generates the index, tag and archive listing pages of a section from the
+    metadata index. A listing page is only rendered again when the pages it
+    lists, their order or the template changed since it was last rendered;
+    otherwise the copy seeded from the previous build is kept.
+
+    Which listings can have changed is told from the pages whose metadata
+    changed during the build: when none of the section did, its recorded
+    listing pages are kept without querying its pages, and otherwise only the
+    tags of the changed pages are listed again, besides the section index and
+    archive.
+
+    :return: A tuple of a dict mapping each listing page path to its (digest,
+        output hash) and the digest of the settings the listings were rendered with
+    """
+    template = load_template(template_path)
+    pipeline = context.pipeline or make_pipeline(base_path)
+    plugin_names = [plugin.name for plugin in pipeline.plugins]
+    settings = hash_bytes(json.dumps([template.text, base_path, plugin_names, page_size, context.drafts])
+                          .encode("utf-8"))
+    index = context.index
+    prefix = section + "/"
+    # The recorded listings of a shard are those of the shard built last. The
+    # stylesheets count the rules used by every listing, so they need every tree.
+    incremental = context.shard is None and context.styles is None and index.section(section) == settings
+
+    rendered = None
+    if incremental and not any(source.startswith(prefix) for source in index.changed):
+        rendered = __keep_listings(index.listings(prefix), dest_dir_path, context)
+    if rendered is None:
+        rendered = {}
+        tags = None
+        if incremental:
+            tags = set()
+            changed_slugs = {slugify_tag(tag) for tag in index.changed_tags}
+            for tag, slug in tag_slugs(index.tags(prefix, context.drafts)).items():
+                kept = None
+                # The slug of a tag can only have moved when a tag it collides with changed
+                if tag not in index.changed_tags and slugify_tag(tag) not in changed_slugs:
+                    kept = __keep_listings(index.listings(f"{prefix}tags/{slug}/"), dest_dir_path, context)
+                if kept is not None:
+                    rendered.update(kept)
+                else:
+                    tags.add(tag)
+        for listing in listing_pages(index, section, page_size, context.drafts, tags):
+            if not context.owns(listing.path) or index.has_path(listing.path):
+                continue
+            to_path = os.path.join(dest_dir_path, listing.path)
+            digest = listing.digest(template.text, base_path, plugin_names,
+                                    context.styles.digest() if context.styles is not None else None)
+            previous = index.listing(listing.path)
+            if previous is not None and previous[0] == digest and context.output.keep(to_path, previous[1]):
+                if context.styles is not None:
+                    # A kept page still counts towards the rules the stylesheets keep
+                    pipeline.run(listing.to_html_node())
+                    context.styles.page(template)
+                    if context.prefetch is not None:
+                        context.prefetch.skip()
+                rendered[listing.path] = previous
+                continue
+            print(f"Generating listing page {to_path}")
+            html_node = pipeline.run(listing.to_html_node())
+            if context.prefetch is not None:
+                # Listings are not pages of the link graph
+                context.prefetch.skip()
+            page_template, head = template, ""
+            if context.styles is not None:
+                page_template, head = context.styles.page(template)
+            page = page_template.render(listing.title, html_node.to_html(), base_path, head)
+            context.output.write_text(to_path, page)
+            rendered[listing.path] = (digest,
+                                      context.output.manifest[relative_output_path(to_path, context.output.root)])
+    if context.sitemap is not None:
+        for path in sorted(rendered):
+            context.sitemap.add(path)
+    return rendered, settings
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Build the static site from content/ and static/.")
+    parser.add_argument("base_path", nargs="?", default="/", help="path prefix the site is served from")
+    parser.add_argument("--out", default="docs", help="output directory, relative to the working directory")
+    parser.add_argument("--shard", type=parse_shard, metavar="I/N",
+                        help="only build shard I of N and write a shard manifest for --merge")
+    parser.add_argument("--archive", metavar="PATH",
+                        help="write the site into a .tar, .tar.gz/.tgz or .zip archive instead of --out")
+    parser.add_argument("--swap", choices=SWAP_MODES, default="rename",
+                        help="how a finished build replaces --out: rename directories, which is only atomic "
+                             "where they can be exchanged (Linux), or flip a symlink, which always is")
+    parser.add_argument("--rollback", action="store_true",
+                        help="make the previous build of --out live again instead of building")
+    parser.add_argument("--cache-dir", default=".cache",
+                        help="directory for state kept between builds, relative to the working directory")
+    parser.add_argument("--delta", metavar="PATH",
+                        help="where to write the added/changed/removed delta against the previous build")
+    parser.add_argument("--section", action="append", dest="sections", metavar="DIR",
+                        help="content directory to generate index, tag and archive listings for (default: blog)")
+    parser.add_argument("--page-size", type=int, default=10, help="entries per listing page")
+    parser.add_argument("--drafts", action="store_true", help="also render pages marked as drafts")
+    parser.add_argument("--plugin", action="append", dest="plugins", choices=sorted(PLUGINS), default=[],
+                        help="run an optional plugin over every page, e.g. external_links")
+    parser.add_argument("--css", choices=["keep", "prune", "critical"], default="keep",
+                        help="copy stylesheets as they are, prune the rules no page uses, or also inline "
+                             "the rules each page uses into its head and load the rest asynchronously")
+    parser.add_argument("--report", metavar="PATH",
+                        help="write a JSON report of the sizes, node counts and timings of every page")
+    parser.add_argument("--report-top", type=int, default=10, metavar="N",
+                        help="outliers listed per statistic in the report")
+    parser.add_argument("--prefetch", type=int, default=0, metavar="N",
+                        help="add up to N hints to every page: a preload for its first image and prefetches "
+                             "for the pages it links to that the site links to most")
+    parser.add_argument("--site-url", metavar="URL",
+                        help="scheme and host the site is served from, e.g. https://example.com; writes "
+                             "sitemap.xml and an Atom feed per section with absolute URLs under the base path")
+    parser.add_argument("--writers", type=int, default=4, metavar="N",
+                        help="write pages from N threads while the next pages are read and rendered; "
+                             "0 generates pages one after another (archives always use one writer)")
+    parser.add_argument("--merge", nargs="+", metavar="SHARD_DIR",
+                        help="merge the outputs of a sharded build into --out instead of building")
+    args = parser.parse_args(argv)
+    if args.archive and args.shard:
+        parser.error("--shard writes a shard directory for --merge and cannot be combined with --archive")
+    if args.shard and args.css != "keep":
+        parser.error("--css needs every page of the site and cannot be combined with --shard")
+    if args.shard and args.site_url:
+        parser.error("--site-url needs every page of the site and cannot be combined with --shard")
+    return args
+
+
+def shard_settings(args):
+    """The options besides the base path that change what a shard renders, which every shard of a build must share."""
+    return {"drafts": args.drafts, "plugins": sorted(args.plugins), "sections": args.sections or ["blog"],
+            "page_size": args.page_size, "prefetch": args.prefetch}
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    work_dir = os.getcwd()
+    dst_dir = os.path.join(work_dir, args.out)
+    cache_dir = os.path.join(work_dir, args.cache_dir)
+    output_name = os.path.basename(args.archive or args.out)
+    manifest_path = os.path.join(cache_dir, "manifests", output_name + ".json")
+    delta_path = os.path.join(work_dir, args.delta) if args.delta \
+        else os.path.join(cache_dir, "deltas", output_name + ".json")
+    if args.rollback:
+        rollback(dst_dir)
+        rollback_manifest(manifest_path, delta_path)
+        return
+
+    if args.archive:
+        output = ArchiveOutput(os.path.join(work_dir, args.archive), dst_dir)
+        try:
+            build(args, work_dir, cache_dir, output)
+        except BaseException:
+            output.abort()
+            raise
+        output.close()
+        record_build(manifest_path, delta_path, output.manifest, args.base_path)
+        return
+
+    # Build into a staging copy of the live output and only swap it in once
+    # the build succeeded, so the served directory is never half-written.
+    mode = swap_mode(dst_dir, args.swap)
+    staging_dir = begin_staging(dst_dir, mode)
+    output = DirectoryOutput(staging_dir, os.path.join(cache_dir, "output-stats", output_name + ".json"))
+    try:
+        build(args, work_dir, cache_dir, output)
+        output.prune()
+        if args.shard:
+            index, count = args.shard
+            write_manifest(os.path.join(staging_dir, SHARD_MANIFEST), output.manifest,
+                           shard_index=index, shard_count=count, base_path=args.base_path,
+                           settings=shard_settings(args))
+    except BaseException:
+        abort_staging(staging_dir)
+        raise
+    commit_staging(staging_dir, dst_dir, mode)
+    output.save_stats()
+    record_build(manifest_path, delta_path, output.manifest, args.base_path)
+
+
+def build(args, work_dir, cache_dir, output):
+    base_path = args.base_path
+    dst_dir = output.root
+    if args.merge:
+        merge_shards([os.path.join(work_dir, shard_dir) for shard_dir in args.merge], output)
+        return
+
+    content_dir = os.path.join(work_dir, "content")
+    index = MetadataIndex(os.path.join(cache_dir, "pages.sqlite"))
+    doc_cache = DocumentCache(os.path.join(cache_dir, "documents"), PARSER_VERSION)
+    pipeline = make_pipeline(base_path, args.plugins)
+    styles = None
+    if args.css != "keep":
+        styles = StyleSheets(critical=args.css == "critical")
+        pipeline.register(styles.plugin)
+    report = BuildReport(args.report_top) if args.report else None
+    prefetch = None
+    if args.prefetch > 0:
+        prefetch = PrefetchHints(index, base_path, args.prefetch)
+        pipeline.register(prefetch.plugin)
+    sitemap = Sitemap(args.site_url, base_path) if args.site_url else None
+    hash_cache = HashCache(os.path.join(cache_dir, "asset-hashes.json"))
+    assets = AssetCopier(output, hash_cache)
+    context = BuildContext(output, work_dir, args.shard, index, content_dir, args.drafts, doc_cache, pipeline,
+                           styles, report, assets, prefetch, sitemap)
+    try:
+        src_dir = os.path.join(work_dir, "static")
+        copy_static_to_public(src_dir, dst_dir, context=context)
+
+        src_dir = content_dir
+        copy_static_to_public(src_dir, dst_dir, context=context, skip_markdown=True)
+        # Identical files across both trees are stored once
+        assets.flush()
+        hash_cache.save(prune=args.shard is None)
+        print(f"Copied {assets.copied} assets, linked {assets.linked} duplicates ({assets.linked_bytes} bytes), "
+              f"{hash_cache.misses} hashed")
+
+        template_path = os.path.join(work_dir, "template.html")
+        if args.writers > 0:
+            jobs = []
+            generate_pages_recursive(src_dir, template_path, dst_dir, base_path, context, jobs)
+            # An archive is one stream, written in order by a single writer
+            writers = 1 if isinstance(output, ArchiveOutput) else args.writers
+            generate_pages_staged(jobs, base_path, context, writers)
+        else:
+            generate_pages_recursive(src_dir, template_path, dst_dir, base_path, context)
+        if prefetch is not None:
+            prefetch.save()
+        index.prune()
+        if args.shard is None:
+            doc_cache.prune()
+
+        listings = {}
+        sections = {}
+        for section in args.sections or ["blog"]:
+            if os.path.isdir(os.path.join(content_dir, section)):
+                section_listings, sections[section] = generate_listings(template_path, dst_dir, base_path, section,
+                                                                        args.page_size, context)
+                listings.update(section_listings)
+                if args.site_url:
+                    write_feed(output, index, section, args.site_url, base_path, args.drafts)
+        # A shard only renders the listings it owns, which a later full build
+        # must not take for every listing of the section
+        index.set_listings(listings, sections if args.shard is None else {})
+        if sitemap is not None:
+            files = sitemap.write(output)
+            print(f"Wrote a sitemap of {sitemap.urls} URLs in {files} file(s)")
+        if styles is not None:
+            styles.write(output)
+        for line in pipeline.report():
+            print(f"Plugin {line}")
+        if report is not None:
+            report.write(os.path.join(work_dir, args.report))
+            print("\n".join(report.summary()))
+    finally:
+        if sitemap is not None:
+            sitemap.discard()
+        index.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
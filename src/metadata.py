@@ -0,0 +1,246 @@
+import json
+import os
+import sqlite3
+
+from frontmatter import page_metadata, read_page_metadata
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    source TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    title TEXT,
+    date TEXT,
+    draft INTEGER NOT NULL,
+    template TEXT,
+    meta TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tags (
+    source TEXT NOT NULL REFERENCES pages(source) ON DELETE CASCADE,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (source, tag)
+);
+CREATE INDEX IF NOT EXISTS tags_by_tag ON tags(tag);
+CREATE TABLE IF NOT EXISTS links (
+    source TEXT NOT NULL REFERENCES pages(source) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    target TEXT NOT NULL,
+    PRIMARY KEY (source, position)
+);
+CREATE INDEX IF NOT EXISTS links_by_target ON links(target);
+CREATE TABLE IF NOT EXISTS listings (
+    path TEXT PRIMARY KEY,
+    digest TEXT NOT NULL,
+    output_hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sections (
+    section TEXT PRIMARY KEY,
+    digest TEXT NOT NULL
+);
+"""
+
+
+class MetadataIndex:
+    """
+    A persistent index of page metadata kept in SQLite. Pages are refreshed
+    from their front matter only when their size or modification time
+    changed, so listing pages and feeds can be generated from the index
+    without reparsing any Markdown.
+
+    The pages whose metadata was added, changed or removed during a build are
+    collected in `changed`, and their tags, before and after, in
+    `changed_tags`, so listings of unaffected pages can be left alone.
+
+    :param db_path: The SQLite database file, created if missing
+    """
+    def __init__(self, db_path):
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.connection = sqlite3.connect(db_path)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.executescript(SCHEMA)
+        self.seen = set()
+        self.changed = set()
+        self.changed_tags = set()
+
+    def __row_to_page(self, row):
+        source, path, mtime_ns, title, date, draft, template, meta = row
+        page = json.loads(meta)
+        page.update({"source": source, "path": path, "mtime_ns": mtime_ns, "title": title, "date": date,
+                     "draft": bool(draft), "template": template})
+        return page
+
+    def __like_prefix(self, prefix):
+        return prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+    def refresh(self, source_path, source, path):
+        """
+        Brings the entry of one page up to date.
+
+        :param source_path: The Markdown file on disk
+        :param source: The key of the page, its path relative to the content directory
+        :param path: The output path the page is rendered to
+        :return: True if the entry was added or changed, False if it was current
+        """
+        self.seen.add(source)
+        stat = os.stat(source_path)
+        row = self.connection.execute(
+            "SELECT mtime_ns, size, path, title, date, draft, template, meta FROM pages WHERE source = ?",
+            (source,)).fetchone()
+        if row is not None and row[:3] == (stat.st_mtime_ns, stat.st_size, path):
+            return False
+        self.__store(source, path, stat.st_mtime_ns, stat.st_size, read_page_metadata(source_path), row)
+        return True
+
+    def refresh_text(self, markdown, source, path):
+        """
+        Like refresh, for a page that is not on disk. Its entry is always
+        rewritten and has no modification time.
+
+        :param markdown: The Markdown document
+        """
+        self.seen.add(source)
+        row = self.connection.execute(
+            "SELECT mtime_ns, size, path, title, date, draft, template, meta FROM pages WHERE source = ?",
+            (source,)).fetchone()
+        self.__store(source, path, 0, len(markdown.encode("utf-8")), page_metadata(markdown, source), row)
+
+    def __store(self, source, path, mtime_ns, size, metadata, row):
+        tags = metadata.get("tags") or []
+        if not isinstance(tags, list):
+            tags = [tags]
+        tags = sorted({str(tag) for tag in tags})
+        extra = {key: value for key, value in metadata.items()
+                 if key not in ("title", "date", "draft", "template", "tags")}
+        extra["tags"] = tags
+        date = metadata.get("date")
+        values = (path, metadata.get("title"), None if date is None else str(date),
+                  int(bool(metadata.get("draft"))), metadata.get("template"), json.dumps(extra, sort_keys=True))
+        # An edit to the body alone leaves every listing as it was
+        if row is None or row[2:] != values:
+            self.changed.add(source)
+            self.changed_tags.update(tags)
+            if row is not None:
+                self.changed_tags.update(json.loads(row[7])["tags"])
+        with self.connection:
+            self.connection.execute(
+                # An upsert rather than INSERT OR REPLACE, whose delete would cascade to the page's links
+                "INSERT INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(source) DO UPDATE SET "
+                "path = excluded.path, mtime_ns = excluded.mtime_ns, size = excluded.size, "
+                "title = excluded.title, date = excluded.date, draft = excluded.draft, "
+                "template = excluded.template, meta = excluded.meta",
+                (source, path, mtime_ns, size) + values[1:])
+            self.connection.execute("DELETE FROM tags WHERE source = ?", (source,))
+            self.connection.executemany("INSERT INTO tags VALUES (?, ?)", [(source, tag) for tag in tags])
+
+    def get(self, source):
+        row = self.connection.execute(
+            "SELECT source, path, mtime_ns, title, date, draft, template, meta FROM pages WHERE source = ?",
+            (source,)).fetchone()
+        return None if row is None else self.__row_to_page(row)
+
+    def pages(self, prefix="", include_drafts=False, tag=None, limit=None):
+        """
+        Lists pages newest first, by front matter date and then by source path.
+
+        :param prefix: Only list pages whose source starts with this prefix, e.g. "blog/"
+        :param include_drafts: Whether to list pages marked as drafts
+        :param tag: Only list pages with this tag
+        :param limit: List at most this many pages
+        :return: A list of page dicts
+        """
+        query = "SELECT source, path, mtime_ns, title, date, draft, template, meta FROM pages " \
+                "WHERE source LIKE ? ESCAPE '\\'"
+        params = [self.__like_prefix(prefix)]
+        if not include_drafts:
+            query += " AND draft = 0"
+        if tag is not None:
+            query += " AND source IN (SELECT source FROM tags WHERE tag = ?)"
+            params.append(tag)
+        query += " ORDER BY date IS NULL, date DESC, source"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return [self.__row_to_page(row) for row in self.connection.execute(query, params)]
+
+    def tags(self, prefix="", include_drafts=False):
+        query = "SELECT DISTINCT tags.tag FROM tags JOIN pages USING (source) WHERE pages.source LIKE ? ESCAPE '\\'"
+        if not include_drafts:
+            query += " AND pages.draft = 0"
+        return [row[0] for row in self.connection.execute(query + " ORDER BY tags.tag", (self.__like_prefix(prefix),))]
+
+    def prune(self):
+        """Drops the entries of pages that were not refreshed during this build."""
+        removed = [(source, meta) for source, meta in self.connection.execute("SELECT source, meta FROM pages")
+                   if source not in self.seen]
+        for source, meta in removed:
+            self.changed.add(source)
+            self.changed_tags.update(json.loads(meta)["tags"])
+        with self.connection:
+            self.connection.executemany("DELETE FROM pages WHERE source = ?", [(source,) for source, _ in removed])
+
+    def has_path(self, path):
+        """Whether a content page is rendered to this output path."""
+        return self.connection.execute("SELECT 1 FROM pages WHERE path = ?", (path,)).fetchone() is not None
+
+    def links(self):
+        """:return: A dict mapping every page with links to the pages it links to, in the order they appear"""
+        links = {}
+        for source, target in self.connection.execute("SELECT source, target FROM links ORDER BY source, position"):
+            links.setdefault(source, []).append(target)
+        return links
+
+    def set_links(self, links):
+        """
+        Replaces the outgoing links of pages in the site link graph, in one transaction.
+
+        :param links: A dict mapping the key of each page to the pages it links to, in the order they appear
+        """
+        with self.connection:
+            self.connection.executemany("DELETE FROM links WHERE source = ?", [(source,) for source in links])
+            self.connection.executemany("INSERT INTO links VALUES (?, ?, ?)",
+                                        [(source, position, target) for source, targets in links.items()
+                                         for position, target in enumerate(targets)])
+
+    def in_degrees(self):
+        """:return: A dict mapping every link target to the number of pages linking to it"""
+        return dict(self.connection.execute("SELECT target, COUNT(DISTINCT source) FROM links GROUP BY target"))
+
+    def listing(self, path):
+        """
+        :return: The (digest, output_hash) recorded when a listing page was last rendered, or None
+        """
+        return self.connection.execute(
+            "SELECT digest, output_hash FROM listings WHERE path = ?", (path,)).fetchone()
+
+    def listings(self, prefix):
+        """
+        :return: A dict mapping the recorded listing pages under a path prefix to their (digest, output_hash)
+        """
+        rows = self.connection.execute("SELECT path, digest, output_hash FROM listings WHERE path LIKE ? ESCAPE '\\'",
+                                       (self.__like_prefix(prefix),))
+        return {path: (digest, output_hash) for path, digest, output_hash in rows}
+
+    def section(self, section):
+        """:return: The digest of the settings the listings of a section were last rendered with, or None"""
+        row = self.connection.execute("SELECT digest FROM sections WHERE section = ?", (section,)).fetchone()
+        return None if row is None else row[0]
+
+    def set_listings(self, listings, sections=None):
+        """
+        Replaces the recorded listing pages.
+
+        :param listings: A dict mapping listing page paths to (digest, output_hash)
+        :param sections: An optional dict mapping sections to the digest of the
+            settings their listings were rendered with, replacing the recorded ones
+        """
+        with self.connection:
+            self.connection.execute("DELETE FROM listings")
+            self.connection.executemany("INSERT INTO listings VALUES (?, ?, ?)",
+                                        [(path,) + state for path, state in listings.items()])
+            if sections is not None:
+                self.connection.execute("DELETE FROM sections")
+                self.connection.executemany("INSERT INTO sections VALUES (?, ?)", sections.items())
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,383 @@
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+import tarfile
+import zipfile
+
+
+def relative_output_path(path, root):
+    """
+    Normalizes an output path to the forward-slash form used in manifests.
+
+    :param path: An absolute or relative path inside the output root
+    :param root: The output root directory
+    :return: The path relative to root, using "/" as the separator
+    """
+    return os.path.relpath(path, root).replace(os.sep, "/")
+
+
+def hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DirectoryOutput:
+    """
+    Writes build output into a directory and records a manifest of every file
+    written, mapping the output-relative path to the sha256 of its contents.
+
+    Files that already hold the right contents are left alone and changed files
+    are replaced rather than rewritten in place, so the directory can be seeded
+    with hardlinks to a previous build without modifying that build.
+
+    :param root: The output directory
+    :param stats_path: An optional JSON file remembering the inode, size and
+        modification time of every file written along with its hash. A file
+        seeded from the previous build that still matches is trusted to hold
+        those contents without being read again.
+    """
+    def __init__(self, root, stats_path=None):
+        self.root = root
+        self.manifest = {}
+        self.stats_path = stats_path
+        self.__dirs = set()
+        self.__known = {}
+        self.__stats = {}
+        if stats_path is not None and os.path.isfile(stats_path):
+            with open(stats_path, "r") as file:
+                self.__known = json.load(file)
+
+    def make_dirs(self, path):
+        os.makedirs(path, exist_ok=True)
+        self.__dirs.add(relative_output_path(path, self.root))
+
+    def __record(self, path, digest):
+        stat = os.stat(path)
+        self.__stats[relative_output_path(path, self.root)] = [stat.st_ino, stat.st_size, stat.st_mtime_ns, digest]
+
+    def __unchanged(self, path, size, digest):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return False
+        if stat.st_size != size:
+            return False
+        state = [stat.st_ino, stat.st_size, stat.st_mtime_ns, digest]
+        rel_path = relative_output_path(path, self.root)
+        # Replaced files get a new inode, so a matching stat means the file was not written since
+        if self.__known.get(rel_path) != state and hash_file(path) != digest:
+            return False
+        self.__stats[rel_path] = state
+        return True
+
+    def write_bytes(self, path, data):
+        digest = hash_bytes(data)
+        self.manifest[relative_output_path(path, self.root)] = digest
+        if self.__unchanged(path, len(data), digest):
+            return
+        self.make_dirs(os.path.dirname(path))
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+        self.__record(path, digest)
+
+    def write_text(self, path, text):
+        self.write_bytes(path, text.encode("utf-8"))
+
+    def copy_file(self, src_path, path, digest=None):
+        """
+        :param digest: The hash of the source file, if it is already known
+        """
+        digest = digest or hash_file(src_path)
+        self.manifest[relative_output_path(path, self.root)] = digest
+        if self.__unchanged(path, os.path.getsize(src_path), digest):
+            return
+        self.make_dirs(os.path.dirname(path))
+        tmp_path = path + ".tmp"
+        shutil.copy(src_path, tmp_path)
+        os.replace(tmp_path, path)
+        self.__record(path, digest)
+
+    def link_file(self, target_path, path, src_path):
+        """
+        Makes `path` a hardlink to the already written `target_path`, which has
+        the same contents as `src_path`. Files are always replaced rather than
+        written in place, so sharing an inode is safe. Falls back to copying
+        where hardlinks are not possible, such as across file systems.
+        """
+        digest = self.manifest[relative_output_path(target_path, self.root)]
+        self.manifest[relative_output_path(path, self.root)] = digest
+        if not (os.path.exists(path) and os.path.samefile(target_path, path)):
+            self.make_dirs(os.path.dirname(path))
+            tmp_path = path + ".tmp"
+            try:
+                os.link(target_path, tmp_path)
+            except OSError:
+                shutil.copy(src_path, tmp_path)
+            os.replace(tmp_path, path)
+        self.__record(path, digest)
+
+    def keep(self, path, digest):
+        """
+        Keeps a file seeded from the previous build instead of regenerating it,
+        as long as it still has the contents it was written with.
+
+        :param path: The output path
+        :param digest: The hash the file had when it was written
+        :return: True if the file was kept, False if it has to be written
+        """
+        if not os.path.isfile(path) or not self.__unchanged(path, os.path.getsize(path), digest):
+            return False
+        self.manifest[relative_output_path(path, self.root)] = digest
+        return True
+
+    def save_stats(self):
+        """Writes the stats of the files written by this build to stats_path, if set."""
+        if self.stats_path is None:
+            return
+        os.makedirs(os.path.dirname(self.stats_path) or ".", exist_ok=True)
+        tmp_path = self.stats_path + ".tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(self.__stats, file, sort_keys=True)
+        os.replace(tmp_path, self.stats_path)
+
+    def prune(self):
+        """
+        Removes files and directories this build did not produce, such as
+        files seeded from a previous build whose sources have been deleted.
+        """
+        for dir_path, dir_names, file_names in os.walk(self.root, topdown=False):
+            for file_name in file_names:
+                path = os.path.join(dir_path, file_name)
+                if relative_output_path(path, self.root) not in self.manifest:
+                    os.remove(path)
+            if dir_path != self.root and not os.listdir(dir_path) \
+                    and relative_output_path(dir_path, self.root) not in self.__dirs:
+                os.rmdir(dir_path)
+
+    def close(self):
+        pass
+
+    def abort(self):
+        pass
+
+
+class MemoryOutput:
+    """
+    Collects build output in memory, mapping output-relative paths to their
+    contents, for rendering without touching the disk.
+
+    :param root: The logical output directory paths passed to the writers live under
+    """
+    def __init__(self, root=os.sep):
+        self.root = root
+        self.manifest = {}
+        self.files = {}
+
+    def make_dirs(self, path):
+        pass
+
+    def write_bytes(self, path, data):
+        rel_path = relative_output_path(path, self.root)
+        self.files[rel_path] = data
+        self.manifest[rel_path] = hash_bytes(data)
+
+    def write_text(self, path, text):
+        self.write_bytes(path, text.encode("utf-8"))
+
+    def copy_file(self, src_path, path, digest=None):
+        with open(src_path, "rb") as file:
+            self.write_bytes(path, file.read())
+
+    def link_file(self, target_path, path, src_path):
+        # The same bytes object is stored under both paths
+        target = relative_output_path(target_path, self.root)
+        rel_path = relative_output_path(path, self.root)
+        self.files[rel_path] = self.files[target]
+        self.manifest[rel_path] = self.manifest[target]
+
+    def keep(self, path, digest):
+        return False
+
+    def close(self):
+        pass
+
+    def abort(self):
+        pass
+
+
+def archive_timestamp():
+    """
+    The modification time stamped on every archive entry. Honours
+    SOURCE_DATE_EPOCH and otherwise uses 1980-01-01, the earliest time a zip
+    entry can carry, so that identical inputs give byte-identical archives.
+    """
+    return max(int(os.environ.get("SOURCE_DATE_EPOCH", 0)), 315532800)
+
+
+class ArchiveOutput:
+    """
+    Streams build output into a tar, gzip-compressed tar or zip archive instead
+    of a directory. The format is picked from the archive file name. Entries
+    are written in the order the build produces them with fixed timestamps and
+    ownership, so the archive only depends on the build inputs.
+
+    :param archive_path: The archive to create; ".zip", ".tar", ".tar.gz" or ".tgz"
+    :param root: The logical output directory paths passed to the writers live under
+    """
+    def __init__(self, archive_path, root):
+        if archive_path.endswith(".zip"):
+            self.format = "zip"
+        elif archive_path.endswith((".tar.gz", ".tgz")):
+            self.format = "tar.gz"
+        elif archive_path.endswith(".tar"):
+            self.format = "tar"
+        else:
+            raise ValueError(f"unknown archive format: {archive_path}")
+        self.root = root
+        self.manifest = {}
+        self.archive_path = archive_path
+        self.mtime = archive_timestamp()
+        self.__dirs = set()
+        # Write next to the final archive and rename on close so a failed
+        # build never leaves a truncated archive behind.
+        self.__partial_path = archive_path + ".partial"
+        self.__file = open(self.__partial_path, "wb")
+        self.__gzip = None
+        self.__tar = None
+        self.__zip = None
+        if self.format == "zip":
+            self.__zip = zipfile.ZipFile(self.__file, "w", zipfile.ZIP_DEFLATED)
+        elif self.format == "tar.gz":
+            self.__gzip = gzip.GzipFile(filename="", mode="wb", fileobj=self.__file, mtime=self.mtime)
+            self.__tar = tarfile.open(fileobj=self.__gzip, mode="w|", format=tarfile.GNU_FORMAT)
+        else:
+            self.__tar = tarfile.open(fileobj=self.__file, mode="w|", format=tarfile.GNU_FORMAT)
+
+    def __tar_info(self, name, entry_type, mode):
+        info = tarfile.TarInfo(name)
+        info.type = entry_type
+        info.mode = mode
+        info.mtime = self.mtime
+        return info
+
+    def __zip_info(self, name, mode):
+        info = zipfile.ZipInfo(name, date_time=(1980, 1, 1, 0, 0, 0))
+        info.external_attr = mode << 16
+        info.compress_type = zipfile.ZIP_DEFLATED
+        return info
+
+    def __add_dir(self, rel_path):
+        if rel_path in ("", ".") or rel_path in self.__dirs:
+            return
+        self.__add_dir(os.path.dirname(rel_path))
+        self.__dirs.add(rel_path)
+        if self.__zip is not None:
+            self.__zip.writestr(self.__zip_info(rel_path + "/", 0o40755), b"")
+        else:
+            self.__tar.addfile(self.__tar_info(rel_path, tarfile.DIRTYPE, 0o755))
+
+    def make_dirs(self, path):
+        self.__add_dir(relative_output_path(path, self.root))
+
+    def write_bytes(self, path, data):
+        rel_path = relative_output_path(path, self.root)
+        self.__add_dir(os.path.dirname(rel_path))
+        if self.__zip is not None:
+            self.__zip.writestr(self.__zip_info(rel_path, 0o100644), data)
+        else:
+            info = self.__tar_info(rel_path, tarfile.REGTYPE, 0o644)
+            info.size = len(data)
+            self.__tar.addfile(info, io.BytesIO(data))
+        self.manifest[rel_path] = hash_bytes(data)
+
+    def write_text(self, path, text):
+        self.write_bytes(path, text.encode("utf-8"))
+
+    def copy_file(self, src_path, path, digest=None):
+        """
+        Streams a file into the archive without reading it into memory.
+
+        :param digest: The hash of the source file, if it is already known
+        """
+        digest = digest or hash_file(src_path)
+        rel_path = relative_output_path(path, self.root)
+        self.__add_dir(os.path.dirname(rel_path))
+        with open(src_path, "rb") as file:
+            size = os.fstat(file.fileno()).st_size
+            if self.__zip is not None:
+                info = self.__zip_info(rel_path, 0o100644)
+                info.file_size = size
+                with self.__zip.open(info, "w") as entry:
+                    shutil.copyfileobj(file, entry)
+            else:
+                info = self.__tar_info(rel_path, tarfile.REGTYPE, 0o644)
+                info.size = size
+                self.__tar.addfile(info, file)
+        self.manifest[rel_path] = digest
+
+    def link_file(self, target_path, path, src_path):
+        """
+        Stores `path` as a hardlink entry to the earlier `target_path` in tar
+        archives. Zip has no hardlinks, so the file is stored again there.
+        """
+        if self.__zip is not None:
+            self.copy_file(src_path, path)
+            return
+        target = relative_output_path(target_path, self.root)
+        rel_path = relative_output_path(path, self.root)
+        self.__add_dir(os.path.dirname(rel_path))
+        info = self.__tar_info(rel_path, tarfile.LNKTYPE, 0o644)
+        info.linkname = target
+        self.__tar.addfile(info)
+        self.manifest[rel_path] = self.manifest[target]
+
+    def keep(self, path, digest):
+        # An archive starts out empty, so there is never a previous file to keep.
+        return False
+
+    def close(self):
+        if self.__zip is not None:
+            self.__zip.close()
+        if self.__tar is not None:
+            self.__tar.close()
+        if self.__gzip is not None:
+            self.__gzip.close()
+        self.__file.close()
+        os.replace(self.__partial_path, self.archive_path)
+
+    def abort(self):
+        self.__file.close()
+        os.remove(self.__partial_path)
+
+
+def write_manifest(path, manifest, **fields):
+    """
+    Writes a manifest as JSON with sorted keys so that identical builds produce
+    identical manifests.
+
+    :param path: Where to write the manifest
+    :param manifest: Mapping of output-relative path to content hash
+    :param fields: Extra top-level fields to store alongside the files
+    """
+    document = dict(fields)
+    document["files"] = manifest
+    with open(path, "w") as file:
+        json.dump(document, file, indent=2, sort_keys=True)
+        file.write("\n")
+
+
+def read_manifest(path):
+    with open(path, "r") as file:
+        return json.load(file)
@@ -1,4 +1,3 @@
-from functools import reduce
 from htmlnode import HTMLNode
 
 class ParentNode(HTMLNode):
@@ -6,7 +5,8 @@ class ParentNode(HTMLNode):
         super().__init__(tag, None, children, props)
 
     def __child_reducer(self, children):
-        return reduce(lambda a, b: a + b, map(lambda x: x.to_html(), children))
+        # join rather than reduce with +, which copies the accumulated string for every child
+        return "".join(map(lambda x: x.to_html(), children))
 
     def __tag_helper(self, tag, children):
         return f"<{tag}>{self.__child_reducer(children)}</{tag}>"
@@ -0,0 +1,125 @@
+import time
+
+from leafnode import LeafNode
+from parentnode import ParentNode
+
+BASE_PATH = "{{basepath}}"
+
+
+class Plugin:
+    """
+    A transform over the HTMLNode tree of a page. A plugin lists the tags of
+    the nodes it wants to see, text being the None tag, or sets tags to None
+    to see every node. It returns the node to use in place of each one it is
+    shown. Plugins must not modify nodes in place, because trees may be shared
+    with caches; returning a new node is how a node is changed.
+    """
+    name = None
+    tags = ()
+
+    def visit(self, node):
+        return node
+
+
+class BasePathPlugin(Plugin):
+    """Substitutes the base path for `{{basepath}}` in link and image URLs."""
+    name = "base_path"
+    tags = ("a", "img")
+
+    def __init__(self, base_path):
+        self.base_path = base_path
+
+    def visit(self, node):
+        attribute = "href" if node.tag == "a" else "src"
+        url = node.props.get(attribute) if node.props else None
+        if url is None or BASE_PATH not in url:
+            return node
+        return LeafNode(node.tag, node.value, {**node.props, attribute: url.replace(BASE_PATH, self.base_path)})
+
+
+class ExternalLinksPlugin(Plugin):
+    """Opens links to other sites in a new tab, without giving them access to the opener."""
+    name = "external_links"
+    tags = ("a",)
+
+    def visit(self, node):
+        url = node.props.get("href", "") if node.props else ""
+        if not url.startswith(("http://", "https://")):
+            return node
+        return LeafNode(node.tag, node.value, {**node.props, "target": "_blank", "rel": "noopener noreferrer"})
+
+
+# Optional plugins by name; the base path plugin always runs.
+PLUGINS = {
+    ExternalLinksPlugin.name: ExternalLinksPlugin,
+}
+
+
+class Pipeline:
+    """
+    Runs plugins over HTMLNode trees. The visitors of all plugins are fused
+    into a single traversal per tree, looked up by the tag of each node, and
+    the time spent in each plugin is added up so a slow one can be found.
+
+    :param plugins: The plugins, run in this order on every node they visit
+    """
+    def __init__(self, plugins=()):
+        self.plugins = []
+        self.seconds = {}
+        self.visits = {}
+        # Every node run through the pipeline, counted since the traversal is made anyway
+        self.nodes = 0
+        self.__visitors = {}
+        self.__every = []
+        for plugin in plugins:
+            self.register(plugin)
+
+    def register(self, plugin):
+        self.plugins.append(plugin)
+        self.seconds[plugin.name] = 0.0
+        self.visits[plugin.name] = 0
+        if plugin.tags is None:
+            self.__every.append(plugin)
+            for visitors in self.__visitors.values():
+                visitors.append(plugin)
+            return
+        for tag in plugin.tags:
+            # Tags seen for the first time start with the plugins that visit every node
+            self.__visitors.setdefault(tag, list(self.__every)).append(plugin)
+
+    def run(self, node):
+        """
+        :param node: The root of the tree, which is left unchanged
+        :return: The transformed tree, sharing every subtree no plugin changed
+        """
+        if not self.plugins:
+            return node
+        return self.__transform(node)
+
+    def __transform(self, node):
+        self.nodes += 1
+        children = node.children
+        if children:
+            transformed = [self.__transform(child) for child in children]
+            if any(new is not old for new, old in zip(transformed, children)):
+                node = ParentNode(node.tag, transformed, node.props)
+        for plugin in self.__visitors.get(node.tag, self.__every):
+            start = time.perf_counter()
+            node = plugin.visit(node)
+            self.seconds[plugin.name] += time.perf_counter() - start
+            self.visits[plugin.name] += 1
+        return node
+
+    def report(self):
+        """:return: One line per plugin with the nodes it visited and the time it took"""
+        return [f"{plugin.name}: {self.visits[plugin.name]} nodes in {self.seconds[plugin.name] * 1000:.1f} ms"
+                for plugin in self.plugins]
+
+
+def make_pipeline(base_path, names=()):
+    """
+    :param base_path: The path prefix the site is served from
+    :param names: The names of optional plugins to run after the base path one
+    :return: A Pipeline
+    """
+    return Pipeline([BasePathPlugin(base_path)] + [PLUGINS[name]() for name in names])
@@ -0,0 +1,151 @@
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from frontmatter import split_front_matter
+from lru import LRUCache
+from main import block_to_html_nodes, extract_title, render_page
+from template import load_template
+
+
+class PreviewRenderer:
+    """
+    Renders Markdown drafts into the page template for live preview. Whole
+    pages are cached by the hash of their source and rendered blocks by their
+    text, so after a one-character edit only the edited block is parsed again.
+
+    :param template_path: The page template, reloaded when it changes on disk
+    :param base_path: The path prefix links are rendered with
+    :param cache_size: The number of pages, and of blocks, kept in the caches
+    """
+    def __init__(self, template_path, base_path="/", cache_size=256):
+        self.template_path = template_path
+        self.base_path = base_path
+        self.pages = LRUCache(cache_size)
+        self.blocks = LRUCache(cache_size * 32)
+        self.requests = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.__lock = threading.Lock()
+
+    def __render_block(self, block):
+        return self.blocks.get_or_compute(block, lambda: block_to_html_nodes(block))
+
+    def __render(self, markdown, template):
+        metadata, body = split_front_matter(markdown)
+        if not metadata.get("title"):
+            try:
+                extract_title(body)
+            except Exception:
+                # Drafts often have no heading yet.
+                metadata["title"] = "Preview"
+        return render_page(metadata, body, template, self.base_path, self.__render_block)
+
+    def render(self, markdown):
+        """
+        :param markdown: The Markdown source, front matter included
+        :return: The rendered page
+        """
+        start = time.perf_counter()
+        try:
+            template = load_template(self.template_path)
+            key = (hashlib.sha256(markdown.encode("utf-8")).hexdigest(), template.text, self.base_path)
+            return self.pages.get_or_compute(key, lambda: self.__render(markdown, template))
+        except Exception:
+            with self.__lock:
+                self.errors += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.__lock:
+                self.requests += 1
+                self.total_seconds += elapsed
+                self.max_seconds = max(self.max_seconds, elapsed)
+
+    def __hit_rate(self, cache):
+        lookups = cache.hits + cache.misses
+        return cache.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        with self.__lock:
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "latency_ms_mean": 1000 * self.total_seconds / self.requests if self.requests else 0.0,
+                "latency_ms_max": 1000 * self.max_seconds,
+                "page_hits": self.pages.hits,
+                "page_misses": self.pages.misses,
+                "page_hit_rate": self.__hit_rate(self.pages),
+                "block_hits": self.blocks.hits,
+                "block_misses": self.blocks.misses,
+                "block_hit_rate": self.__hit_rate(self.blocks),
+            }
+
+
+class PreviewHandler(BaseHTTPRequestHandler):
+    """POST /render renders the Markdown request body; GET /stats reports the counters."""
+    renderer = None
+
+    def __respond(self, status, content_type, body):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        if self.path != "/render":
+            self.__respond(404, "text/plain; charset=utf-8", "not found\n")
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        markdown = self.rfile.read(length).decode("utf-8")
+        try:
+            page = self.renderer.render(markdown)
+        except Exception as error:
+            self.__respond(400, "text/plain; charset=utf-8", f"{error}\n")
+            return
+        self.__respond(200, "text/html; charset=utf-8", page)
+
+    def do_GET(self):
+        if self.path != "/stats":
+            self.__respond(404, "text/plain; charset=utf-8", "not found\n")
+            return
+        self.__respond(200, "application/json", json.dumps(self.renderer.stats()) + "\n")
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(renderer, port=8000):
+    """
+    Creates a preview server bound to localhost only, handling each request
+    on its own thread.
+    """
+    handler = type("BoundPreviewHandler", (PreviewHandler,), {"renderer": renderer})
+    return ThreadingHTTPServer(("127.0.0.1", port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve live Markdown previews on localhost.")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--template", default="template.html")
+    parser.add_argument("--base-path", default="/")
+    args = parser.parse_args()
+
+    server = make_server(PreviewRenderer(args.template, args.base_path), args.port)
+    print(f"Serving previews on http://127.0.0.1:{server.server_address[1]}/render")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
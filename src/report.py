@@ -0,0 +1,87 @@
+import json
+import os
+
+# The page fields outliers are ranked by, with the label the summary uses
+OUTLIER_FIELDS = {
+    "output_bytes": "Largest pages",
+    "html_nodes": "Most HTML nodes",
+    "total_ms": "Slowest pages",
+}
+
+
+class BuildReport:
+    """
+    Collects per-page statistics during a build: sizes, block, TextNode and
+    HTMLNode counts, parse and render times and whether the parsed tree came
+    from the document cache. Adding a page is a dict append, so the report is
+    cheap enough to leave on.
+
+    :param top: The number of outliers listed per field
+    """
+    def __init__(self, top=10):
+        self.top = top
+        self.pages = []
+
+    def add(self, path, source_bytes, output_bytes, stats):
+        """
+        :param path: The output path of the page, relative to the output root
+        :param source_bytes: The size of the Markdown source
+        :param output_bytes: The size of the rendered page
+        :param stats: The dict render_page filled in
+        """
+        parse_ms = stats["parse_seconds"] * 1000
+        render_ms = stats["render_seconds"] * 1000
+        self.pages.append({
+            "path": path,
+            "source_bytes": source_bytes,
+            "output_bytes": output_bytes,
+            "blocks": stats["blocks"],
+            "text_nodes": stats["text_nodes"],
+            "html_nodes": stats["html_nodes"],
+            "parse_ms": round(parse_ms, 3),
+            "render_ms": round(render_ms, 3),
+            "total_ms": round(parse_ms + render_ms, 3),
+            "cache": stats["cache"],
+        })
+
+    def totals(self):
+        totals = {"pages": len(self.pages)}
+        for field in ("source_bytes", "output_bytes", "blocks", "text_nodes", "html_nodes"):
+            totals[field] = sum(page[field] for page in self.pages)
+        for field in ("parse_ms", "render_ms", "total_ms"):
+            totals[field] = round(sum(page[field] for page in self.pages), 3)
+        for status in ("hit", "miss", "off"):
+            totals[f"cache_{status}"] = sum(1 for page in self.pages if page["cache"] == status)
+        return totals
+
+    def outliers(self):
+        """:return: A dict mapping each outlier field to the paths of its top pages, largest first"""
+        return {field: [page["path"] for page in sorted(self.pages, key=lambda page: (-page[field], page["path"]))[:self.top]]
+                for field in OUTLIER_FIELDS}
+
+    def to_dict(self):
+        return {"totals": self.totals(), "outliers": self.outliers(),
+                "pages": sorted(self.pages, key=lambda page: page["path"])}
+
+    def write(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as file:
+            json.dump(self.to_dict(), file, indent=2)
+            file.write("\n")
+
+    def summary(self):
+        """:return: The report as lines of readable text"""
+        totals = self.totals()
+        lines = [
+            f"Build report: {totals['pages']} pages, {totals['source_bytes']} bytes of Markdown "
+            f"rendered to {totals['output_bytes']} bytes",
+            f"  {totals['blocks']} blocks, {totals['text_nodes']} text nodes, {totals['html_nodes']} HTML nodes",
+            f"  parse {totals['parse_ms']:.1f} ms, render {totals['render_ms']:.1f} ms, "
+            f"document cache {totals['cache_hit']} hits, {totals['cache_miss']} misses",
+        ]
+        pages = {page["path"]: page for page in self.pages}
+        for field, paths in self.outliers().items():
+            lines.append(f"{OUTLIER_FIELDS[field]}:")
+            for path in paths:
+                lines.append(f"  {pages[path][field]:>12} {path}")
+        return lines
@@ -0,0 +1,83 @@
+import hashlib
+import json
+import os
+
+from output import read_manifest
+
+SHARD_MANIFEST = ".shard-manifest.json"
+
+
+def parse_shard(spec):
+    """
+    Parses a shard specification of the form "I/N" where shards are numbered
+    from 1 to N.
+
+    :param spec: The shard specification, e.g. "2/4"
+    :return: A tuple of (index, count)
+    :raises ValueError: If the specification is malformed or out of range
+    """
+    try:
+        index, count = (int(part) for part in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"invalid shard: {spec}, expected I/N")
+    if count < 1 or index < 1 or index > count:
+        raise ValueError(f"invalid shard: {spec}, expected 1 <= I <= N")
+    return index, count
+
+
+def shard_of(source_path, count):
+    """
+    Assigns a source path to a shard. The assignment only depends on the path
+    itself, so adding pages never moves existing pages between shards and the
+    hash spreads pages evenly as the site grows.
+
+    :param source_path: The source path relative to the site root, e.g. "content/blog/tom/index.md"
+    :param count: The number of shards
+    :return: The 1-based shard index the path belongs to
+    """
+    normalized = source_path.replace(os.sep, "/").encode("utf-8")
+    digest = hashlib.sha1(normalized).digest()
+    return int.from_bytes(digest[:8], "big") % count + 1
+
+
+def merge_shards(shard_dirs, output):
+    """
+    Combines the outputs of a sharded build into a single output, using the
+    manifest each shard wrote to know which files it owns.
+
+    :param shard_dirs: The output directories of every shard
+    :param output: The output backend to merge into
+    :raises ValueError: If shards are missing or duplicated, were built with
+        different base paths or settings, or if two shards wrote different
+        contents to the same path
+    """
+    manifests = [read_manifest(os.path.join(shard_dir, SHARD_MANIFEST)) for shard_dir in shard_dirs]
+
+    counts = {manifest["shard_count"] for manifest in manifests}
+    if len(counts) != 1:
+        raise ValueError(f"shards come from builds with different shard counts: {sorted(counts)}")
+    count = counts.pop()
+    for field, label in (("base_path", "base paths"), ("settings", "settings")):
+        values = {json.dumps(manifest.get(field), sort_keys=True) for manifest in manifests}
+        if len(values) != 1:
+            raise ValueError(f"shards come from builds with different {label}: " + ", ".join(sorted(values)))
+    indexes = sorted(manifest["shard_index"] for manifest in manifests)
+    if indexes != list(range(1, count + 1)):
+        raise ValueError(f"expected shards 1..{count}, got {indexes}")
+
+    owners = {}
+    conflicts = []
+    for shard_dir, manifest in zip(shard_dirs, manifests):
+        for rel_path, digest in sorted(manifest["files"].items()):
+            if rel_path in owners:
+                owner_dir, owner_digest = owners[rel_path]
+                if owner_digest != digest:
+                    conflicts.append(f"{rel_path} ({owner_dir} and {shard_dir})")
+                continue
+            owners[rel_path] = (shard_dir, digest)
+    if conflicts:
+        raise ValueError("conflicting shard outputs: " + ", ".join(conflicts))
+
+    for rel_path in sorted(owners):
+        shard_dir, _ = owners[rel_path]
+        output.copy_file(os.path.join(shard_dir, rel_path), os.path.join(output.root, rel_path))
@@ -0,0 +1,119 @@
+import os
+from collections.abc import Mapping
+
+from frontmatter import split_front_matter
+from listing import listing_pages
+from lru import LRUCache
+from main import render_page
+from metadata import MetadataIndex
+from output import MemoryOutput
+from plugins import make_pipeline
+from template import compile_template
+from vfs import MemoryFileSystem
+
+
+class SiteBuilder:
+    """
+    Renders sites and single pages in-process without touching the disk.
+    Content, templates and assets are read from an in-memory mapping or from
+    any object with the same interface as vfs.MemoryFileSystem, and rendered
+    output is returned instead of written. Compiled templates and rendered
+    pages are cached between calls, so rendering unchanged pages again is a
+    cache lookup.
+
+    :param source: A mapping of paths to contents, or a file system object
+    :param base_path: The path prefix the site is served from
+    :param template: The path of the default page template
+    :param static_dir: The directory whose files are copied as they are
+    :param content_dir: The directory of Markdown pages
+    :param drafts: Whether pages marked as drafts are rendered
+    :param cache_size: The number of rendered pages kept
+    :param sections: The content directories listing pages are generated for
+    :param page_size: The number of entries per listing page
+    """
+    def __init__(self, source, base_path="/", template="template.html", static_dir="static",
+                 content_dir="content", drafts=False, cache_size=1024, sections=("blog",), page_size=10):
+        self.fs = MemoryFileSystem(source) if isinstance(source, Mapping) else source
+        self.base_path = base_path
+        self.template = template
+        self.static_dir = static_dir
+        self.content_dir = content_dir
+        self.drafts = drafts
+        self.pages = LRUCache(cache_size)
+        self.sections = sections
+        self.page_size = page_size
+
+    def __template_for(self, metadata):
+        path = self.template
+        if metadata.get("template"):
+            path = os.path.join(os.path.dirname(self.template), metadata["template"])
+        return compile_template(self.fs.read_text(path))
+
+    def render_markdown(self, markdown):
+        """
+        Renders one Markdown document, front matter included, into its template.
+
+        :param markdown: The Markdown source
+        :return: The rendered page, or None for a draft when drafts are not rendered
+        """
+        metadata, body = split_front_matter(markdown)
+        if metadata.get("draft") and not self.drafts:
+            return None
+        template = self.__template_for(metadata)
+        key = (markdown, template.text, self.base_path)
+        return self.pages.get_or_compute(key, lambda: render_page(metadata, body, template, self.base_path))
+
+    def render(self, path):
+        """
+        Renders the page at a content path, e.g. "content/blog/tom/index.md".
+        """
+        return self.render_markdown(self.fs.read_text(path))
+
+    def build(self):
+        """
+        Renders the whole site, the way main() builds it on disk: static
+        files, content assets, pages and the listing pages of every section, from a metadata
+        index kept in memory for the build.
+
+        :return: A dict mapping output paths, e.g. "blog/tom/index.html", to their contents as bytes
+        """
+        output = MemoryOutput()
+        self.__copy_files(self.static_dir, output)
+        # Files besides the Markdown pages are copied like static files
+        self.__copy_files(self.content_dir, output, skip_markdown=True)
+        index = MetadataIndex(":memory:")
+        try:
+            for path in self.fs.walk(self.content_dir):
+                if not path.endswith(".md"):
+                    continue
+                markdown = self.fs.read_text(path)
+                rel_path = os.path.relpath(path, self.content_dir)[:-3] + ".html"
+                index.refresh_text(markdown, os.path.relpath(path, self.content_dir), rel_path)
+                page = self.render_markdown(markdown)
+                if page is not None:
+                    output.write_text(os.path.join(output.root, rel_path), page)
+            self.__build_listings(index, output)
+        finally:
+            index.close()
+        return output.files
+
+    def __copy_files(self, directory, output, skip_markdown=False):
+        for path in self.fs.walk(directory):
+            if skip_markdown and path.endswith(".md"):
+                continue
+            rel_path = os.path.relpath(path, directory)
+            output.write_bytes(os.path.join(output.root, rel_path), self.fs.read_bytes(path))
+
+    def __build_listings(self, index, output):
+        template = self.__template_for({})
+        pipeline = make_pipeline(self.base_path)
+        for section in self.sections:
+            if not self.fs.walk(os.path.join(self.content_dir, section)):
+                continue
+            for listing in listing_pages(index, section, self.page_size, self.drafts):
+                # A page of the section rendered to the same path takes its place
+                if index.has_path(listing.path):
+                    continue
+                html_node = pipeline.run(listing.to_html_node())
+                output.write_text(os.path.join(output.root, listing.path),
+                                  template.render(listing.title, html_node.to_html(), self.base_path))
@@ -0,0 +1,188 @@
+import hashlib
+import os
+import tempfile
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+from xml.sax.saxutils import escape, quoteattr
+
+from listing import page_url
+
+# The most URLs the sitemap protocol allows in one sitemap file
+SITEMAP_LIMIT = 50000
+FEED_ENTRIES = 20
+
+XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8"?>\n'
+SITEMAP_NAMESPACE = "http://www.sitemaps.org/schemas/sitemap/0.9"
+
+
+def w3c_datetime(mtime_ns):
+    """Formats a modification time the way sitemaps and Atom feeds expect it."""
+    return datetime.fromtimestamp(mtime_ns / 1e9, timezone.utc).isoformat(timespec="seconds")
+
+
+def page_updated(page):
+    """
+    :param page: A page dict from the MetadataIndex
+    :return: When the page was last updated: its front matter date, or else
+        when its source last changed
+    """
+    if page["date"]:
+        try:
+            date = datetime.fromisoformat(page["date"])
+        except ValueError:
+            pass
+        else:
+            if date.tzinfo is None:
+                date = date.replace(tzinfo=timezone.utc)
+            return date.astimezone(timezone.utc).isoformat(timespec="seconds")
+    return w3c_datetime(page["mtime_ns"])
+
+
+class StreamedFile:
+    """
+    A generated file written piece by piece to a temporary file and hashed on
+    the way, so it is never held in memory. It is published by copying it
+    into the output, which leaves a file from the previous build alone when
+    it already has the same contents.
+    """
+    def __init__(self):
+        fd, self.tmp_path = tempfile.mkstemp(suffix=".xml")
+        # mkstemp makes the file private, and copying it into the output keeps its mode
+        os.chmod(self.tmp_path, 0o644)
+        self.file = os.fdopen(fd, "wb")
+        self.hash = hashlib.sha256()
+
+    def write(self, text):
+        data = text.encode("utf-8")
+        self.hash.update(data)
+        self.file.write(data)
+
+    def publish(self, output, path):
+        """
+        :param output: The output backend
+        :param path: The output path, relative to the output root
+        """
+        self.file.close()
+        output.copy_file(self.tmp_path, os.path.join(output.root, path), self.hash.hexdigest())
+        self.discard()
+
+    def discard(self):
+        self.file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+class Sitemap:
+    """
+    Writes sitemap.xml from the pages as they are generated, one entry at a
+    time. Past `limit` URLs the entries go on in another file: the files are
+    then published as sitemap-1.xml, sitemap-2.xml and so on, and sitemap.xml
+    becomes the sitemap index listing them.
+
+    :param site_url: The scheme and host the site is served from, e.g. "https://example.com"
+    :param base_path: The path prefix the site is served from
+    :param limit: The most URLs in one sitemap file
+    """
+    def __init__(self, site_url, base_path, limit=SITEMAP_LIMIT):
+        self.prefix = site_url.rstrip("/") + base_path
+        self.limit = limit
+        self.urls = 0
+        # Every file as a [StreamedFile, newest lastmod] pair
+        self.parts = []
+
+    def __start_part(self):
+        part = StreamedFile()
+        part.write(f'{XML_DECLARATION}<urlset xmlns="{SITEMAP_NAMESPACE}">\n')
+        self.parts.append([part, None])
+
+    def add(self, path, mtime_ns=None):
+        """
+        :param path: The output path of the page, relative to the output root
+        :param mtime_ns: When the source of the page last changed, if known
+        """
+        if self.urls % self.limit == 0:
+            if self.parts:
+                self.parts[-1][0].write("</urlset>\n")
+            self.__start_part()
+        part = self.parts[-1]
+        entry = f"<url><loc>{escape(self.prefix + page_url(path))}</loc>"
+        if mtime_ns is not None:
+            lastmod = w3c_datetime(mtime_ns)
+            entry += f"<lastmod>{lastmod}</lastmod>"
+            part[1] = max(part[1] or lastmod, lastmod)
+        part[0].write(entry + "</url>\n")
+        self.urls += 1
+
+    def write(self, output):
+        """
+        Publishes the sitemap once every page was added.
+
+        :return: The number of sitemap files
+        """
+        if not self.parts:
+            self.__start_part()
+        self.parts[-1][0].write("</urlset>\n")
+        if len(self.parts) == 1:
+            self.parts[0][0].publish(output, "sitemap.xml")
+            return 1
+
+        index = StreamedFile()
+        try:
+            index.write(f'{XML_DECLARATION}<sitemapindex xmlns="{SITEMAP_NAMESPACE}">\n')
+            for number, (part, lastmod) in enumerate(self.parts, start=1):
+                path = f"sitemap-{number}.xml"
+                part.publish(output, path)
+                entry = f"<sitemap><loc>{escape(self.prefix + path)}</loc>"
+                if lastmod is not None:
+                    entry += f"<lastmod>{lastmod}</lastmod>"
+                index.write(entry + "</sitemap>\n")
+            index.write("</sitemapindex>\n")
+            index.publish(output, "sitemap.xml")
+        finally:
+            index.discard()
+        return len(self.parts)
+
+    def discard(self):
+        """Removes the temporary files of a sitemap that is not written."""
+        for part, _ in self.parts:
+            part.discard()
+
+
+def write_feed(output, index, section, site_url, base_path, include_drafts=False, entries=FEED_ENTRIES):
+    """
+    Writes the Atom feed of a section to `<section>/atom.xml`, with its
+    newest pages from the metadata index. No Markdown is read.
+
+    :param output: The output backend
+    :param index: The MetadataIndex of the site
+    :param section: The content directory the feed is for, e.g. "blog"
+    :param site_url: The scheme and host the site is served from
+    :param base_path: The path prefix the site is served from
+    :param include_drafts: Whether drafts are listed
+    :param entries: The most pages in the feed
+    """
+    prefix = site_url.rstrip("/") + base_path
+    pages = index.pages(section + "/", include_drafts, limit=entries)
+    updated = [page_updated(page) for page in pages]
+    section_url = prefix + section + "/"
+
+    feed = StreamedFile()
+    try:
+        feed.write(f'{XML_DECLARATION}<feed xmlns="http://www.w3.org/2005/Atom">\n'
+                   f"<title>{escape(section.replace('-', ' ').title())}</title>\n"
+                   f"<id>{escape(section_url)}</id>\n"
+                   f"<link href={quoteattr(section_url)}/>\n"
+                   f'<link rel="self" href={quoteattr(section_url + "atom.xml")}/>\n'
+                   f"<updated>{max(updated, default=w3c_datetime(0))}</updated>\n"
+                   f"<author><name>{escape(urlsplit(site_url).netloc)}</name></author>\n")
+        for page, page_time in zip(pages, updated):
+            url = prefix + page_url(page["path"])
+            entry = (f"<entry><title>{escape(page['title'] or page_url(page['path']))}</title>"
+                     f"<link href={quoteattr(url)}/><id>{escape(url)}</id><updated>{page_time}</updated>")
+            if page.get("description"):
+                entry += f"<summary>{escape(str(page['description']))}</summary>"
+            feed.write(entry + "</entry>\n")
+        feed.write("</feed>\n")
+        feed.publish(output, section + "/atom.xml")
+    finally:
+        feed.discard()
@@ -0,0 +1,121 @@
+import queue
+import threading
+
+# Marks the end of a queue
+DONE = object()
+# How often a thread blocked on a queue checks whether the run was stopped, in seconds
+POLL_INTERVAL = 0.1
+
+
+class PageStages:
+    """
+    Generates pages in three overlapping stages connected by bounded queues:
+    a reader thread prefetches source files, the calling thread renders them
+    in order, and a pool of writer threads takes rendered pages off the queue
+    in batches and writes them through the output backend. The bounded queues
+    make a fast stage wait for a slow one instead of piling up pages in memory.
+    Pages are rendered in the order they are given, so the output matches a
+    serial build; with a single writer they are also written in that order,
+    which outputs that write one stream, like archives, need.
+
+    :param output: The output backend pages are written through
+    :param writers: The number of writer threads
+    :param depth: The number of pages each queue holds
+    :param batch: The most pages a writer takes off the queue at once
+    """
+    def __init__(self, output, writers=4, depth=16, batch=8):
+        if writers < 1:
+            raise ValueError("at least one writer is needed")
+        self.output = output
+        self.writers = writers
+        self.depth = depth
+        self.batch = batch
+
+    def __put(self, items, item, stop):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=POLL_INTERVAL)
+                return
+            except queue.Full:
+                pass
+
+    def __get(self, items, stop):
+        while not stop.is_set():
+            try:
+                return items.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                pass
+        return DONE
+
+    def run(self, jobs, read, render):
+        """
+        :param jobs: The pages to generate, in order
+        :param read: Called with a job on the reader thread; returns what render needs
+        :param render: Called with a job and what read returned on the calling
+            thread; returns a (path, bytes) tuple to write, or None to write nothing
+        """
+        read_queue = queue.Queue(self.depth)
+        write_queue = queue.Queue(self.depth)
+        stop = threading.Event()
+        errors = []
+
+        def reader():
+            for job in jobs:
+                try:
+                    item = (job, read(job), None)
+                except Exception as error:
+                    item = (job, None, error)
+                self.__put(read_queue, item, stop)
+                if item[2] is not None:
+                    return
+            self.__put(read_queue, DONE, stop)
+
+        def writer():
+            try:
+                while True:
+                    item = self.__get(write_queue, stop)
+                    if item is DONE:
+                        return
+                    batch = [item]
+                    # Only take what is already queued; a DONE ends this writer after the batch
+                    while len(batch) < self.batch:
+                        try:
+                            item = write_queue.get_nowait()
+                        except queue.Empty:
+                            break
+                        batch.append(item)
+                        if item is DONE:
+                            break
+                    for item in batch:
+                        if item is DONE:
+                            return
+                        self.output.write_bytes(*item)
+            except Exception as error:
+                errors.append(error)
+                stop.set()
+
+        threads = [threading.Thread(target=reader, daemon=True)]
+        threads += [threading.Thread(target=writer, daemon=True) for _ in range(self.writers)]
+        for thread in threads:
+            thread.start()
+        try:
+            while True:
+                item = self.__get(read_queue, stop)
+                if item is DONE:
+                    break
+                job, value, error = item
+                if error is not None:
+                    raise error
+                result = render(job, value)
+                if result is not None:
+                    self.__put(write_queue, result, stop)
+            for _ in range(self.writers):
+                self.__put(write_queue, DONE, stop)
+        except BaseException:
+            stop.set()
+            raise
+        finally:
+            for thread in threads:
+                thread.join()
+        if errors:
+            raise errors[0]
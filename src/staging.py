@@ -0,0 +1,168 @@
+import ctypes
+import errno
+import os
+import shutil
+import time
+
+SWAP_MODES = ("rename", "symlink")
+
+# From <fcntl.h> and <linux/fs.h>
+AT_FDCWD = -100
+RENAME_EXCHANGE = 2
+
+
+def __link_or_copy(src_path, dst_path):
+    try:
+        os.link(src_path, dst_path)
+    except OSError:
+        shutil.copy2(src_path, dst_path)
+
+
+def __exchange(path, other_path):
+    """
+    Atomically swaps two directories with renameat2(RENAME_EXCHANGE), so
+    neither path is ever missing.
+
+    :return: False where the system or the filesystem cannot exchange paths
+    """
+    try:
+        renameat2 = ctypes.CDLL(None, use_errno=True).renameat2
+    except (AttributeError, OSError):
+        return False
+    if renameat2(AT_FDCWD, os.fsencode(path), AT_FDCWD, os.fsencode(other_path), RENAME_EXCHANGE) == 0:
+        return True
+    error = ctypes.get_errno()
+    if error in (errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP):
+        return False
+    raise OSError(error, os.strerror(error), path, None, other_path)
+
+
+def __builds_dir(live_dir):
+    return live_dir + ".builds"
+
+
+def swap_mode(live_dir, requested):
+    """
+    A live directory that is already a symlink can only be swapped by flipping
+    the link, whatever was requested.
+    """
+    if os.path.islink(live_dir):
+        return "symlink"
+    return requested
+
+
+def begin_staging(live_dir, mode="rename"):
+    """
+    Creates a fresh staging directory for a build and seeds it with hardlinks
+    to the files of the live build, so files the build leaves unchanged cost
+    no extra disk space or writes. The staging directory lives next to the
+    live one so the final swap is a rename on the same filesystem.
+
+    :param live_dir: The directory the web server serves
+    :param mode: "rename" or "symlink", see commit_staging
+    :return: The path of the staging directory
+    """
+    if mode == "symlink":
+        staging_dir = os.path.join(__builds_dir(live_dir), f"build-{time.time_ns()}")
+    else:
+        staging_dir = live_dir + ".staging"
+        shutil.rmtree(staging_dir, ignore_errors=True)
+    os.makedirs(os.path.dirname(staging_dir) or ".", exist_ok=True)
+
+    if os.path.isdir(live_dir):
+        shutil.copytree(os.path.realpath(live_dir), staging_dir, copy_function=__link_or_copy)
+    else:
+        os.makedirs(staging_dir)
+    return staging_dir
+
+
+def abort_staging(staging_dir):
+    """Throws a failed build away, leaving the live directory untouched."""
+    shutil.rmtree(staging_dir, ignore_errors=True)
+
+
+def commit_staging(staging_dir, live_dir, mode="rename"):
+    """
+    Swaps a finished staging directory in as the live build and keeps the
+    previous build around for rollback.
+
+    In "rename" mode the live directory stays a real directory: the staging
+    directory and the live one are exchanged in one atomic rename and the
+    previous build then moved to `<live>.previous`. Where paths cannot be
+    exchanged, which is anywhere but Linux, the previous build is renamed
+    away first and the path is missing for the instant between the two
+    renames. In "symlink" mode the live path is a symlink into
+    `<live>.builds/` that is replaced in a single atomic rename.
+
+    :param staging_dir: The directory returned by begin_staging
+    :param live_dir: The directory the web server serves
+    :param mode: "rename" or "symlink"
+    """
+    if mode == "symlink":
+        builds_dir = __builds_dir(live_dir)
+        previous_dir = None
+        if os.path.islink(live_dir):
+            previous_dir = os.path.realpath(live_dir)
+        elif os.path.isdir(live_dir):
+            # First symlink build over a plain directory; keep it as the previous build.
+            previous_dir = os.path.join(builds_dir, "build-0")
+            os.rename(live_dir, previous_dir)
+        __point_symlink(live_dir, staging_dir)
+        __prune_builds(builds_dir, keep=[staging_dir, previous_dir])
+    else:
+        previous_dir = live_dir + ".previous"
+        shutil.rmtree(previous_dir, ignore_errors=True)
+        if os.path.isdir(live_dir) and __exchange(staging_dir, live_dir):
+            os.rename(staging_dir, previous_dir)
+            return
+        if os.path.exists(live_dir):
+            os.rename(live_dir, previous_dir)
+        os.rename(staging_dir, live_dir)
+
+
+def rollback(live_dir):
+    """
+    Makes the previous build live again.
+
+    :param live_dir: The directory the web server serves
+    :raises ValueError: If there is no previous build to roll back to
+    """
+    if os.path.islink(live_dir):
+        builds_dir = __builds_dir(live_dir)
+        current = os.path.realpath(live_dir)
+        older = [os.path.join(builds_dir, build) for build in __sorted_builds(builds_dir)]
+        older = [build for build in older if os.path.realpath(build) != current]
+        if not older:
+            raise ValueError(f"no previous build of {live_dir} to roll back to")
+        __point_symlink(live_dir, older[-1])
+        return
+
+    previous_dir = live_dir + ".previous"
+    if not os.path.isdir(previous_dir):
+        raise ValueError(f"no previous build of {live_dir} to roll back to")
+    if __exchange(previous_dir, live_dir):
+        return
+    swap_dir = live_dir + ".rollback"
+    os.rename(live_dir, swap_dir)
+    os.rename(previous_dir, live_dir)
+    os.rename(swap_dir, previous_dir)
+
+
+def __point_symlink(link_path, target_dir):
+    tmp_link = link_path + ".tmp-link"
+    if os.path.lexists(tmp_link):
+        os.remove(tmp_link)
+    os.symlink(os.path.relpath(target_dir, os.path.dirname(os.path.abspath(link_path))), tmp_link)
+    os.replace(tmp_link, link_path)
+
+
+def __sorted_builds(builds_dir):
+    return sorted(os.listdir(builds_dir), key=lambda build: int(build.split("-")[1]))
+
+
+def __prune_builds(builds_dir, keep):
+    keep = {os.path.realpath(build) for build in keep if build}
+    for build in os.listdir(builds_dir):
+        build_dir = os.path.join(builds_dir, build)
+        if os.path.realpath(build_dir) not in keep:
+            shutil.rmtree(build_dir)
@@ -0,0 +1,68 @@
+import os
+import re
+
+from lru import LRUCache
+
+SLOT_PATTERN = re.compile(r"\{\{ (Title|Content|TOC) \}\}")
+
+
+class Template:
+    """
+    A page template split once into literal text and its `{{ Title }}`,
+    `{{ Content }}` and optional `{{ TOC }}` slots, so rendering a page is a
+    single join rather than a search-and-replace over the whole template for
+    every slot.
+
+    :param text: The template source
+    """
+    def __init__(self, text):
+        self.text = text
+        self.parts = []
+        position = 0
+        for match in SLOT_PATTERN.finditer(text):
+            self.parts.append(text[position:match.start()])
+            self.parts.append(match.group(1))
+            position = match.end()
+        self.parts.append(text[position:])
+        self.has_toc = "TOC" in self.parts[1::2]
+        # Extra head markup is a slot of its own, just before </head>
+        for index in range(0, len(self.parts), 2):
+            head_end = self.parts[index].find("</head>")
+            if head_end != -1:
+                literal = self.parts[index]
+                self.parts[index:index + 1] = [literal[:head_end], "Head", literal[head_end:]]
+                break
+
+    def render(self, title, content, base_path, head="", toc=""):
+        """
+        Fills the slots. `{{basepath}}` is substituted in the template text and
+        the title only; URLs in the content get the base path from the plugin
+        pipeline before it is serialized, so the page is not searched again.
+
+        :param head: Markup inserted just before `</head>`, if the template has one
+        :param toc: The table of contents, for the `{{ TOC }}` slot
+        """
+        values = {"Title": title.replace("{{basepath}}", base_path), "Content": content, "Head": head, "TOC": toc}
+        # Even indices are literal text, odd indices are slot names
+        return "".join(part.replace("{{basepath}}", base_path) if index % 2 == 0 else values[part]
+                       for index, part in enumerate(self.parts))
+
+
+__compiled = LRUCache(max_size=64)
+
+
+def compile_template(text):
+    """Compiles template source, reusing the compiled template for source seen before."""
+    return __compiled.get_or_compute(text, lambda: Template(text))
+
+
+def load_template(path):
+    """Reads and compiles a template file, reusing the compiled template until the file changes."""
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    return __compiled.get_or_compute(key, lambda: compile_template(__read(path)))
+
+
+def __read(path):
+    with open(path, "r") as file:
+        return file.read()
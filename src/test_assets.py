@@ -0,0 +1,138 @@
+import contextlib
+import io
+import os
+import tarfile
+import tempfile
+import unittest
+import zipfile
+from unittest import mock
+
+import output as output_module
+from assets import AssetCopier, HashCache
+from main import main
+from output import ArchiveOutput, DirectoryOutput, MemoryOutput, hash_bytes
+from test_shard import write_site
+
+
+def write_assets(root):
+    files = {"static/a.png": b"same", "static/b.png": b"other", "static/images/c.png": b"same",
+             "content/blog/d.png": b"same"}
+    paths = []
+    for rel_path, data in files.items():
+        path = os.path.join(root, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as file:
+            file.write(data)
+        paths.append((path, os.path.join(root, "out", os.path.basename(path))))
+    return paths
+
+
+class TestHashCache(unittest.TestCase):
+    def test_unchanged_files_are_not_hashed_again(self):
+        with tempfile.TemporaryDirectory() as root:
+            paths = [src for src, _ in write_assets(root)]
+            cache_path = os.path.join(root, "cache", "hashes.json")
+            cache = HashCache(cache_path)
+            digests = cache.digests(paths)
+            self.assertEqual(digests[paths[0]], hash_bytes(b"same"))
+            self.assertEqual((cache.hits, cache.misses), (0, 4))
+            cache.save()
+
+            with open(paths[1], "wb") as file:
+                file.write(b"changed")
+            cache = HashCache(cache_path)
+            digests = cache.digests(paths)
+            self.assertEqual((cache.hits, cache.misses), (3, 1))
+            self.assertEqual(digests[paths[1]], hash_bytes(b"changed"))
+
+    def test_save_prunes_unused_entries(self):
+        with tempfile.TemporaryDirectory() as root:
+            paths = [src for src, _ in write_assets(root)]
+            cache_path = os.path.join(root, "hashes.json")
+            cache = HashCache(cache_path)
+            cache.digests(paths)
+            cache.save()
+            cache = HashCache(cache_path)
+            cache.digests(paths[:1])
+            cache.save(prune=False)
+            cache = HashCache(cache_path)
+            cache.digests(paths)
+            self.assertEqual(cache.hits, 4)
+            cache = HashCache(cache_path)
+            cache.digests(paths[:1])
+            cache.save()
+            cache = HashCache(cache_path)
+            cache.digests(paths)
+            self.assertEqual(cache.hits, 1)
+
+
+class TestAssetCopier(unittest.TestCase):
+    def copy(self, root, output):
+        assets = AssetCopier(output, HashCache(os.path.join(root, "hashes.json")))
+        for src_path, path in write_assets(root):
+            assets.add(src_path, path)
+        assets.flush()
+        self.assertEqual((assets.copied, assets.linked, assets.linked_bytes), (2, 2, 8))
+        return output
+
+    def test_directory_duplicates_are_hardlinks(self):
+        with tempfile.TemporaryDirectory() as root:
+            out = os.path.join(root, "out")
+            output = self.copy(root, DirectoryOutput(out))
+            self.assertTrue(os.path.samefile(os.path.join(out, "a.png"), os.path.join(out, "c.png")))
+            self.assertTrue(os.path.samefile(os.path.join(out, "a.png"), os.path.join(out, "d.png")))
+            self.assertFalse(os.path.samefile(os.path.join(out, "a.png"), os.path.join(out, "b.png")))
+            self.assertEqual(output.manifest["d.png"], hash_bytes(b"same"))
+
+    def test_directory_falls_back_to_copies(self):
+        with tempfile.TemporaryDirectory() as root:
+            out = os.path.join(root, "out")
+            with mock.patch("os.link", side_effect=OSError("cross-device link")):
+                self.copy(root, DirectoryOutput(out))
+            self.assertFalse(os.path.samefile(os.path.join(out, "a.png"), os.path.join(out, "c.png")))
+            with open(os.path.join(out, "c.png"), "rb") as file:
+                self.assertEqual(file.read(), b"same")
+
+    def test_memory_duplicates_share_data(self):
+        with tempfile.TemporaryDirectory() as root:
+            output = self.copy(root, MemoryOutput(os.path.join(root, "out")))
+            self.assertIs(output.files["a.png"], output.files["d.png"])
+
+    def test_tar_duplicates_are_link_entries(self):
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, "site.tar")
+            output = self.copy(root, ArchiveOutput(path, os.path.join(root, "out")))
+            output.close()
+            with tarfile.open(path) as tar:
+                self.assertTrue(tar.getmember("c.png").islnk())
+                self.assertEqual(tar.getmember("c.png").linkname, "a.png")
+                self.assertEqual(tar.extractfile("d.png").read(), b"same")
+
+    def test_zip_stores_duplicates_again(self):
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, "site.zip")
+            output = self.copy(root, ArchiveOutput(path, os.path.join(root, "out")))
+            output.close()
+            with zipfile.ZipFile(path) as archive:
+                self.assertEqual(archive.read("d.png"), b"same")
+
+
+class TestUnchangedBuild(unittest.TestCase):
+    def test_output_files_are_not_hashed_again(self):
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as root:
+            write_site(root)
+            os.chdir(root)
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    main(["/"])
+                    with mock.patch("output.hash_file", wraps=output_module.hash_file) as hash_file:
+                        main(["/"])
+            finally:
+                os.chdir(cwd)
+            hashed = [call.args[0] for call in hash_file.call_args_list]
+            self.assertEqual([path for path in hashed if "docs.staging" in path], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
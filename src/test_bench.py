@@ -0,0 +1,54 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from bench import BENCHMARKS, NO_BASELINE, compare, main, median_confidence_interval, run_benchmarks, summarize, \
+    synthetic_site
+
+
+class TestBench(unittest.TestCase):
+    def test_median_confidence_interval(self):
+        samples = [5, 1, 4, 2, 3, 100, 3, 2, 4, 3, 3]
+        low, high = median_confidence_interval(samples)
+        self.assertLessEqual(low, 3)
+        self.assertGreaterEqual(high, 3)
+        self.assertLess(high, 100)
+
+    def test_compare(self):
+        baseline = {
+            "steady": summarize([1.0, 1.01, 0.99, 1.0, 1.02, 0.98, 1.0]),
+            "slower": summarize([1.0, 1.01, 0.99, 1.0, 1.02, 0.98, 1.0]),
+            "noisy": summarize([1.0, 0.5, 1.5, 1.0, 2.0, 0.6, 1.0]),
+        }
+        current = {
+            "steady": summarize([1.01, 1.0, 1.02, 0.99, 1.0, 1.01, 1.0]),
+            "slower": summarize([1.3, 1.31, 1.29, 1.3, 1.32, 1.28, 1.3]),
+            "noisy": summarize([1.3, 0.6, 1.9, 1.3, 2.2, 0.7, 1.3]),
+            "added": summarize([1.0]),
+        }
+        statuses = {name: status for name, _, status in compare(baseline, current, 0.10)}
+        self.assertEqual(statuses, {"steady": "unchanged", "slower": "regressed", "noisy": "unchanged", "added": "new"})
+
+    def test_run_benchmarks(self):
+        results = run_benchmarks(["serialize"], repeat=3)
+        self.assertEqual(len(results["serialize"]["samples"]), 3)
+        self.assertIn("parse", BENCHMARKS)
+
+    def test_missing_baseline(self):
+        with tempfile.TemporaryDirectory() as root:
+            stderr = io.StringIO()
+            with contextlib.redirect_stderr(stderr):
+                status = main(["compare", "--baseline", os.path.join(root, "missing.json"), "--only", "inline"])
+        self.assertEqual(status, NO_BASELINE)
+        self.assertIn("No baseline", stderr.getvalue())
+
+    def test_synthetic_pages_differ(self):
+        site = synthetic_site(5)
+        bodies = {text.split("---\n", 2)[2] for path, text in site.items() if path.endswith(".md")}
+        self.assertEqual(len(bodies), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+import os
+import tempfile
+import unittest
+
+from css import StyleSheets, defer_stylesheets, format_css, parse_css, selector_matches, template_usage
+from main import markdown_to_html_node, render_page
+from output import MemoryOutput
+from plugins import make_pipeline
+from template import Template
+
+STYLESHEET = """@charset "utf-8";
+/* comments are dropped */
+body {
+  margin: 0;
+}
+
+h1,
+h2 {
+  color: red;
+}
+
+a:hover, a.external {
+  color: blue;
+}
+
+pre code {
+  padding: 0;
+}
+
+@media (max-width: 600px) {
+  h2 { font-size: 1em; }
+  table { width: 100%; }
+}
+
+@font-face { font-family: x; src: url(x.woff); }
+"""
+
+
+class TestCSS(unittest.TestCase):
+    def test_parse_css(self):
+        statements = parse_css(STYLESHEET)
+        self.assertEqual([statement[0] for statement in statements],
+                         ["raw", "rule", "rule", "rule", "rule", "group", "raw"])
+        self.assertEqual(statements[2][1], ["h1", "h2"])
+        self.assertEqual(statements[5][1], "@media (max-width: 600px)")
+
+    def test_selector_matches(self):
+        used = {"a", "pre", "code", ".external", "#top"}
+        self.assertTrue(selector_matches("a:hover", used))
+        self.assertTrue(selector_matches("pre > code", used))
+        self.assertTrue(selector_matches("a.external[href]", used))
+        self.assertTrue(selector_matches("#top", used))
+        self.assertTrue(selector_matches("::-webkit-scrollbar", used))
+        self.assertTrue(selector_matches("*", used))
+        self.assertFalse(selector_matches("h1", used))
+        self.assertFalse(selector_matches("a.internal", used))
+        self.assertFalse(selector_matches("ul code", used))
+
+    def test_format_css_prunes(self):
+        css = format_css(parse_css(STYLESHEET), {"body", "h2", "a"})
+        self.assertEqual(css, '@charset "utf-8";\n\nbody {\n  margin: 0;\n}\n\nh2 {\n  color: red;\n}\n\n'
+                              'a:hover {\n  color: blue;\n}\n\n@media (max-width: 600px) {\nh2 { font-size: 1em; }\n}'
+                              '\n\n@font-face { font-family: x; src: url(x.woff); }')
+
+    def test_format_css_keeps_everything_used(self):
+        statements = parse_css("p {\n  margin: 0;\n}\n\nh1,\nh2 {\n  color: red;\n}")
+        self.assertEqual(format_css(statements, {"p", "h1", "h2"}), "p {\n  margin: 0;\n}\n\nh1,\nh2 {\n  color: red;\n}")
+
+    def test_template_usage(self):
+        self.assertEqual(template_usage('<html><body class="dark wide"><main id="top">{{ Content }}</main></body></html>'),
+                         {"html", "body", "main", ".dark", ".wide", "#top"})
+
+    def test_defer_stylesheets(self):
+        self.assertEqual(defer_stylesheets('<link href="a.css" rel="stylesheet" />'),
+                         '<link href="a.css" rel="preload" as="style" onload="this.onload=null;this.rel=\'stylesheet\'" />'
+                         '<noscript><link href="a.css" rel="stylesheet" /></noscript>')
+
+
+class TestStyleSheets(unittest.TestCase):
+    def render(self, styles, markdown, template):
+        pipeline = make_pipeline("/")
+        pipeline.register(styles.plugin)
+        return render_page({"title": "Title"}, markdown, template, "/", pipeline=pipeline, styles=styles)
+
+    def test_prune_uses_every_page(self):
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, "index.css")
+            with open(path, "w") as file:
+                file.write(STYLESHEET)
+            styles = StyleSheets()
+            styles.add(path, "/index.css")
+            template = Template("<html><head></head><body>{{ Content }}</body></html>")
+            page = self.render(styles, "# Title", template)
+            self.assertEqual(page, "<html><head></head><body><div><h1 id=\"title\">Title</h1></div></body></html>")
+            self.render(styles, "```\ncode\n```", template)
+            output = MemoryOutput()
+            styles.write(output)
+            css = output.files["index.css"].decode("utf-8")
+            self.assertIn("h1 {", css)
+            self.assertIn("pre code {", css)
+            self.assertIn("body {", css)
+            self.assertNotIn("h2", css)
+            self.assertNotIn("a:hover", css)
+
+    def test_critical_css_is_inlined_per_page(self):
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, "index.css")
+            with open(path, "w") as file:
+                file.write(STYLESHEET)
+            styles = StyleSheets(critical=True)
+            styles.add(path, "/index.css")
+            template = Template('<head><link href="/index.css" rel="stylesheet"></head>{{ Content }}')
+            page = self.render(styles, "## Section", template)
+            head = page[:page.index("</head>")]
+            self.assertIn('rel="preload"', head)
+            self.assertIn("<style>", head)
+            self.assertIn("h2 {\n  color: red;\n}", head)
+            self.assertIn("h2 { font-size: 1em; }", head)
+            self.assertNotIn("body {", head)
+            self.assertNotIn("pre code", head)
+
+    def test_usage_is_collected_from_the_tree(self):
+        styles = StyleSheets()
+        pipeline = make_pipeline("/")
+        pipeline.register(styles.plugin)
+        pipeline.run(markdown_to_html_node("- [link](/x)"))
+        self.assertEqual(styles.plugin.page, {"div", "ul", "li", "a"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import json
+import os
+import tempfile
+import unittest
+
+from delta import compute_delta, record_build, rollback_manifest
+from output import read_manifest
+
+
+class TestDelta(unittest.TestCase):
+    def test_compute_delta(self):
+        previous = {"index.html": "a", "old.html": "b", "same.css": "c"}
+        current = {"index.html": "A", "new.html": "d", "same.css": "c"}
+        self.assertEqual(compute_delta(previous, current), {
+            "added": {"new.html": "d"},
+            "changed": {"index.html": "A"},
+            "removed": {"old.html": "b"},
+        })
+
+    def test_record_build_uses_previous_manifest(self):
+        with tempfile.TemporaryDirectory() as root:
+            manifest_path = os.path.join(root, "manifests", "docs.json")
+            delta_path = os.path.join(root, "deltas", "docs.json")
+            first = record_build(manifest_path, delta_path, {"index.html": "a"}, "/")
+            self.assertEqual(first["added"], {"index.html": "a"})
+
+            second = record_build(manifest_path, delta_path, {"index.html": "b", "new.html": "c"}, "/")
+            self.assertEqual(second["changed"], {"index.html": "b"})
+            with open(delta_path) as file:
+                self.assertEqual(json.load(file), second)
+
+            rolled_back = rollback_manifest(manifest_path, delta_path)
+            self.assertEqual(read_manifest(manifest_path)["files"], {"index.html": "a"})
+            self.assertEqual(rolled_back, {"added": {}, "changed": {"index.html": "a"},
+                                           "removed": {"new.html": "c"}, "base_path": "/"})
+            with open(delta_path) as file:
+                self.assertEqual(json.load(file), rolled_back)
+
+
+if __name__ == "__main__":
+    unittest.main()
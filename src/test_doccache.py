@@ -0,0 +1,54 @@
+import os
+import tempfile
+import time
+import unittest
+
+from bench import DOCUMENT
+from doccache import DocumentCache, decode_node, encode_node
+from main import PARSER_VERSION, markdown_to_html_node
+
+
+class TestDocumentCache(unittest.TestCase):
+    def test_round_trip(self):
+        node = markdown_to_html_node(DOCUMENT)
+        self.assertEqual(decode_node(encode_node(node)).to_html(), node.to_html())
+
+    def test_get_or_parse(self):
+        with tempfile.TemporaryDirectory() as root:
+            cache = DocumentCache(root, PARSER_VERSION)
+            node, _, cached = cache.get_or_parse("# Hi", lambda: (markdown_to_html_node("# Hi"), [(1, "hi", "Hi")]))
+            self.assertFalse(cached)
+            node, toc, cached = DocumentCache(root, PARSER_VERSION).get_or_parse("# Hi", self.fail)
+            self.assertTrue(cached)
+            self.assertEqual(node.to_html(), "<div><h1 id=\"hi\">Hi</h1></div>")
+            self.assertEqual(toc, [(1, "hi", "Hi")])
+
+            _, _, cached = DocumentCache(root, PARSER_VERSION + 1).get_or_parse("# Hi", lambda: (markdown_to_html_node("# Hi"), []))
+            self.assertFalse(cached)
+
+    def test_prune_removes_unused_entries(self):
+        with tempfile.TemporaryDirectory() as root:
+            cache = DocumentCache(root, PARSER_VERSION)
+            cache.get_or_parse("# A", lambda: (markdown_to_html_node("# A"), []))
+            cache.get_or_parse("# B", lambda: (markdown_to_html_node("# B"), []))
+            cache = DocumentCache(root, PARSER_VERSION)
+            cache.get_or_parse("# A", self.fail)
+            cache.prune()
+            self.assertEqual(sum(len(files) for _, _, files in os.walk(root)), 1)
+
+    def test_loading_is_faster_than_parsing(self):
+        with tempfile.TemporaryDirectory() as root:
+            DocumentCache(root, PARSER_VERSION).get_or_parse(DOCUMENT, lambda: (markdown_to_html_node(DOCUMENT), []))
+            start = time.perf_counter()
+            for _ in range(5):
+                markdown_to_html_node(DOCUMENT)
+            parse = time.perf_counter() - start
+            start = time.perf_counter()
+            for _ in range(5):
+                DocumentCache(root, PARSER_VERSION).get_or_parse(DOCUMENT, self.fail)
+            load = time.perf_counter() - start
+            self.assertLess(load, parse / 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+
+from frontmatter import parse_front_matter, read_page_metadata, split_front_matter
+
+
+class TestFrontMatter(unittest.TestCase):
+    def test_parse_front_matter(self):
+        text = """title: "Why Tom Bombadil Was a Mistake"
+date: 2024-03-01
+draft: false
+order: 3
+# a comment
+tags: [tolkien, opinion]
+authors:
+  - Archmage
+  - 'Tom'"""
+        self.assertEqual(parse_front_matter(text), {
+            "title": "Why Tom Bombadil Was a Mistake",
+            "date": "2024-03-01",
+            "draft": False,
+            "order": 3,
+            "tags": ["tolkien", "opinion"],
+            "authors": ["Archmage", "Tom"],
+        })
+
+    def test_parse_front_matter_invalid(self):
+        with self.assertRaises(ValueError):
+            parse_front_matter("just some text")
+        with self.assertRaises(ValueError):
+            parse_front_matter("- orphan item")
+
+    def test_split_front_matter(self):
+        metadata, body = split_front_matter("---\ntitle: Hi\n---\n# Heading\n\ntext")
+        self.assertEqual(metadata, {"title": "Hi"})
+        self.assertEqual(body, "# Heading\n\ntext")
+
+    def test_split_front_matter_without_front_matter(self):
+        self.assertEqual(split_front_matter("# Heading"), ({}, "# Heading"))
+
+    def test_split_front_matter_unclosed(self):
+        with self.assertRaises(ValueError):
+            split_front_matter("---\ntitle: Hi\n# Heading")
+
+    def test_read_page_metadata(self):
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, "index.md")
+            with open(path, "w") as file:
+                file.write("---\ndate: 2024-01-01\n---\n\n# From the heading\n\nbody")
+            self.assertEqual(read_page_metadata(path), {"date": "2024-01-01", "title": "From the heading"})
+
+            with open(path, "w") as file:
+                file.write("# Plain page\n\nbody")
+            self.assertEqual(read_page_metadata(path), {"title": "Plain page"})
+
+
+if __name__ == "__main__":
+    unittest.main()
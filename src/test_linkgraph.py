@@ -0,0 +1,127 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from linkgraph import PrefetchHints, is_page_key, link_key
+from main import main, markdown_to_html_node
+from metadata import MetadataIndex
+from plugins import make_pipeline
+from test_shard import read_tree, write_site
+
+
+class TestLinkKey(unittest.TestCase):
+    def test_internal_links(self):
+        self.assertEqual(link_key("/site/blog/tom/", "/site/"), "blog/tom")
+        self.assertEqual(link_key("/site/blog/tom/index.html#top", "/site/"), "blog/tom")
+        self.assertEqual(link_key("/site/", "/site/"), "")
+        self.assertEqual(link_key("/blog/tom?page=2", "/site/"), "blog/tom")
+        self.assertEqual(link_key("../majesty/", "/site/", "blog/tom"), "blog/majesty")
+        self.assertEqual(link_key("./", "/", "blog"), "blog")
+
+    def test_external_links(self):
+        for url in ("https://example.com/", "//cdn.example.com/a.js", "mailto:me@example.com", "#section"):
+            self.assertIsNone(link_key(url, "/"))
+
+    def test_is_page_key(self):
+        self.assertTrue(is_page_key("blog/tom"))
+        self.assertTrue(is_page_key("about.html"))
+        self.assertTrue(is_page_key(""))
+        self.assertFalse(is_page_key("images/tom.png"))
+
+
+class TestPrefetchHints(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.index = MetadataIndex(os.path.join(self.tmp.name, "pages.sqlite"))
+        self.hints = PrefetchHints(self.index, "/", 2)
+        self.pipeline = make_pipeline("/")
+        self.pipeline.register(self.hints.plugin)
+
+    def tearDown(self):
+        self.index.close()
+        self.tmp.cleanup()
+
+    def page(self, source, path, markdown):
+        content = os.path.join(self.tmp.name, source)
+        with open(content, "w") as file:
+            file.write(markdown)
+        self.index.refresh(content, source, path)
+        self.pipeline.run(markdown_to_html_node(markdown))
+        return self.hints.page(source, path)
+
+    def test_most_linked_pages_first(self):
+        self.page("a.md", "a/index.html", "[c](/c/) [d](/d/)")
+        self.page("b.md", "b/index.html", "[d](/d/)")
+        head = self.page("e.md", "e/index.html", "[self](/e/) [a](/a/) [c](/c/) [d](/d/) [d again](/d/index.html)")
+        self.assertEqual(head, '<link rel="prefetch" href="/d/"><link rel="prefetch" href="/c/">')
+
+    def test_saved_graph_ranks_the_next_build(self):
+        self.page("a.md", "a/index.html", "[c](/c/) [d](/d/)")
+        self.page("b.md", "b/index.html", "[d](/d/)")
+        self.hints.save()
+        self.assertEqual(self.index.in_degrees(), {"c": 1, "d": 2})
+
+        self.hints = PrefetchHints(self.index, "/", 1)
+        self.pipeline = make_pipeline("/")
+        self.pipeline.register(self.hints.plugin)
+        self.assertEqual(self.page("a.md", "a/index.html", "[c](/c/) [d](/d/)"), '<link rel="prefetch" href="/d/">')
+        self.page("b.md", "b/index.html", "[c](/c/)")
+        # Only the pages whose links changed are written back
+        self.assertEqual(self.hints.changed, {"b.md": ["c"]})
+        self.assertEqual(self.page("e.md", "e/index.html", "[d](/d/) [c](/c/)"), '<link rel="prefetch" href="/c/">')
+
+    def test_first_image_is_preloaded(self):
+        head = self.page("a.md", "a/index.html", "![one](/one.png)\n\n![two](/two.png)\n\n[b](/b/) [c](/c/)")
+        self.assertEqual(head, '<link rel="preload" as="image" href="/one.png"><link rel="prefetch" href="/b/">')
+
+    def test_links_to_files_are_not_prefetched(self):
+        head = self.page("a.md", "a/index.html", "[pdf](/paper.pdf) [out](https://example.com/)")
+        self.assertEqual(head, "")
+
+    def test_skip_forgets_links(self):
+        self.pipeline.run(markdown_to_html_node("[b](/b/)"))
+        self.hints.skip()
+        self.assertEqual(self.page("a.md", "a/index.html", "text"), "")
+
+
+class TestPrefetchBuild(unittest.TestCase):
+    def test_pages_get_hints(self):
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as root:
+            write_site(root)
+            with open(os.path.join(root, "template.html"), "w") as file:
+                file.write("<html><head><title>{{ Title }}</title></head><body>{{ Content }}</body></html>")
+            with open(os.path.join(root, "content", "blog", "one", "index.md"), "w") as file:
+                file.write("# One\n\n[two](/blog/two/) [three](/blog/three/)")
+            with open(os.path.join(root, "content", "blog", "two", "index.md"), "w") as file:
+                file.write("# Two\n\n[three](/blog/three/)")
+            os.chdir(root)
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    # Pages are ranked by the graph stored so far, which is complete from the second build on
+                    main(["/", "--out", "serial", "--writers", "0", "--prefetch", "1"])
+                    main(["/", "--out", "serial", "--writers", "0", "--prefetch", "1"])
+                    main(["/", "--out", "staged", "--prefetch", "1"])
+                    main(["/", "--out", "plain"])
+            finally:
+                os.chdir(cwd)
+            os.utime(os.path.join(root, "content", "blog", "two", "index.md"), ns=(0, 0))
+            os.chdir(root)
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    main(["/", "--out", "touched", "--prefetch", "1"])
+            finally:
+                os.chdir(cwd)
+            # A changed page keeps its links, so other pages are ranked the same
+            self.assertEqual(read_tree(os.path.join(root, "touched")), read_tree(os.path.join(root, "staged")))
+            pages = read_tree(os.path.join(root, "serial"))
+            self.assertEqual(pages, read_tree(os.path.join(root, "staged")))
+            self.assertIn(b'<link rel="prefetch" href="/blog/three/"></head>', pages["blog/one/index.html"])
+            self.assertNotIn(b"prefetch", pages["index.html"])
+            self.assertNotIn(b"prefetch", read_tree(os.path.join(root, "plain"))["blog/one/index.html"])
+
+
+if __name__ == "__main__":
+    unittest.main()
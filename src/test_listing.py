@@ -0,0 +1,133 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import main as main_module
+from listing import listing_pages, page_url, slugify_tag, tag_slugs
+from main import BuildContext, generate_listings
+from metadata import MetadataIndex
+from output import DirectoryOutput
+
+
+class TestListing(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.index = MetadataIndex(os.path.join(self.root, "pages.sqlite"))
+        self.template_path = os.path.join(self.root, "template.html")
+        with open(self.template_path, "w") as file:
+            file.write("<title>{{ Title }}</title>{{ Content }}")
+
+    def tearDown(self):
+        self.index.close()
+        self.tmp.cleanup()
+
+    def add_post(self, name, date, tags="[]"):
+        path = os.path.join(self.root, "content", "blog", name, "index.md")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            file.write(f"---\ntitle: {name}\ndate: {date}\ntags: {tags}\n---\n")
+        self.index.refresh(path, f"blog/{name}/index.md", f"blog/{name}/index.html")
+
+    def test_page_url(self):
+        self.assertEqual(page_url("index.html"), "")
+        self.assertEqual(page_url("blog/tom/index.html"), "blog/tom/")
+        self.assertEqual(page_url("about.html"), "about.html")
+
+    def test_slugify_tag(self):
+        self.assertEqual(slugify_tag("Middle Earth!"), "middle-earth")
+
+    def test_colliding_tags_get_unique_slugs(self):
+        slugs = tag_slugs(["C++", "C#", "rust"])
+        self.assertEqual(slugs["C#"], "c")
+        self.assertEqual(slugs["rust"], "rust")
+        self.assertTrue(slugs["C++"].startswith("c-"))
+        self.assertEqual(tag_slugs(["C++", "C#"]), {"C#": "c", "C++": slugs["C++"]})
+
+        self.add_post("cpp", "2024-01-01", "[C++]")
+        self.add_post("csharp", "2024-01-02", "[C#]")
+        tag_pages = {listing.path: listing.title for listing in listing_pages(self.index, "blog", 10)
+                     if "/tags/" in listing.path}
+        self.assertEqual(tag_pages, {"blog/tags/c/index.html": 'Tagged "C#"',
+                                     f"blog/tags/{slugs['C++']}/index.html": 'Tagged "C++"'})
+
+    def test_listing_pages_paginate(self):
+        for day in range(1, 6):
+            self.add_post(f"post{day}", f"2024-01-0{day}", "[tolkien]")
+        listings = {listing.path: listing for listing in listing_pages(self.index, "blog", 2)}
+        self.assertEqual(sorted(listings), [
+            "blog/archive/index.html",
+            "blog/index.html",
+            "blog/page/2/index.html",
+            "blog/page/3/index.html",
+            "blog/tags/tolkien/index.html",
+            "blog/tags/tolkien/page/2/index.html",
+            "blog/tags/tolkien/page/3/index.html",
+        ])
+        first = listings["blog/index.html"]
+        self.assertEqual([entry[1] for entry in first.groups[0][1]], ["post5", "post4"])
+        self.assertEqual(first.next_url, "blog/page/2/")
+        self.assertEqual(listings["blog/page/2/index.html"].previous_url, "blog/")
+        self.assertEqual(listings["blog/archive/index.html"].groups[0][0], "2024")
+
+    def test_only_changed_listings_are_rendered(self):
+        for day in range(1, 5):
+            self.add_post(f"post{day}", f"2024-01-0{day}")
+        dst_dir = os.path.join(self.root, "docs")
+        context = BuildContext(DirectoryOutput(dst_dir), index=self.index)
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.index.set_listings(generate_listings(self.template_path, dst_dir, "/", "blog", 2, context)[0])
+        mtimes = {path: os.stat(os.path.join(dst_dir, path)).st_mtime_ns for path in context.output.manifest}
+
+        # Tagging a post adds its tag page but leaves the section and archive pages as they were.
+        self.add_post("post1", "2024-01-01", "[new]")
+        context = BuildContext(DirectoryOutput(dst_dir), index=self.index)
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_listings(self.template_path, dst_dir, "/", "blog", 2, context)
+        changed = sorted(path for path in context.output.manifest
+                         if os.stat(os.path.join(dst_dir, path)).st_mtime_ns != mtimes.get(path))
+        self.assertEqual(changed, ["blog/tags/new/index.html"])
+        with open(os.path.join(dst_dir, "blog", "index.html")) as file:
+            self.assertIn("<title>Blog</title>", file.read())
+
+    def render_listings(self):
+        """Renders the listings like a new build would and records them."""
+        dst_dir = os.path.join(self.root, "docs")
+        context = BuildContext(DirectoryOutput(dst_dir), index=self.index)
+        with mock.patch("main.listing_pages", wraps=main_module.listing_pages) as pages, \
+                contextlib.redirect_stdout(io.StringIO()):
+            listings, settings = generate_listings(self.template_path, dst_dir, "/", "blog", 2, context)
+        self.index.set_listings(listings, {"blog": settings})
+        self.index.changed, self.index.changed_tags = set(), set()
+        return listings, pages
+
+    def test_unchanged_section_is_not_queried(self):
+        for day in range(1, 5):
+            self.add_post(f"post{day}", f"2024-01-0{day}", "[a]")
+        listings, _ = self.render_listings()
+        # Touching a post without changing its metadata leaves the section alone
+        os.utime(os.path.join(self.root, "content", "blog", "post1", "index.md"), ns=(0, 0))
+        self.add_post("post1", "2024-01-01", "[a]")
+        self.assertEqual(self.index.changed, set())
+        kept, pages = self.render_listings()
+        pages.assert_not_called()
+        self.assertEqual(kept, listings)
+
+    def test_only_changed_tags_are_listed_again(self):
+        self.add_post("post1", "2024-01-01", "[a, b]")
+        self.add_post("post2", "2024-01-02", "[b, c]")
+        self.render_listings()
+        self.add_post("post1", "2024-01-01", "[a, d]")
+        listings, pages = self.render_listings()
+        # b lost a post, and c is the only tag left alone
+        self.assertEqual(pages.call_args.args[-1], {"a", "b", "d"})
+        self.assertEqual(sorted(path for path in listings if "/tags/" in path),
+                         ["blog/tags/a/index.html", "blog/tags/b/index.html", "blog/tags/c/index.html",
+                          "blog/tags/d/index.html"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,27 @@
+import unittest
+
+from lru import LRUCache
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(max_size=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(len(cache), 2)
+
+    def test_get_or_compute_counts(self):
+        cache = LRUCache()
+        calls = []
+        for _ in range(3):
+            cache.get_or_compute("key", lambda: calls.append(1) or "value")
+        self.assertEqual(len(calls), 1)
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,7 +2,8 @@ import unittest
 
 from main import text_node_to_html_node, split_nodes_delimiter, extract_markdown_links, extract_markdown_images, \
     TextNode, TextType, split_nodes_image, split_nodes_link, text_to_text_nodes, markdown_to_blocks, \
-    block_to_block_type, BlockType, heading_text_to_heading_leafnode, markdown_to_html_node, extract_title
+    block_to_block_type, BlockType, heading_text_to_heading_leafnode, markdown_to_html_node, extract_title, \
+    slugify_heading, unique_slug, toc_to_html_node
 
 
 class TestMainTextNodeToHtmlNode(unittest.TestCase):
@@ -116,6 +117,10 @@ class TestMainSplitNodesDelimiter(unittest.TestCase):
         with self.assertRaises(Exception):
             split_nodes_delimiter([TextNode("This is _busted.", TextType.TEXT)], "_", TextType.TEXT)
 
+    def test_split_nodes_delimiter_ignores_delimiters_in_code(self):
+        result = split_nodes_delimiter([TextNode("def f(**kwargs)", TextType.CODE)], "**", TextType.BOLD)
+        self.assertEqual(result, [TextNode("def f(**kwargs)", TextType.CODE)])
+
     def test_split_nodes_delimiter_check_for_no_delimiters_bold(self):
         """
         Test if the delimiter check does not throw an exception for plain old strings without the delimiter.
@@ -155,6 +160,16 @@ class TestMainImageAndLinkExtract(unittest.TestCase):
             new_nodes,
         )
 
+    def test_split_links_with_unmatched_brackets(self):
+        node = TextNode("[[see -*- [this](https://a.dev)] and ![x]", TextType.TEXT)
+        self.assertListEqual(
+            [
+                TextNode("[see -*- [this", TextType.LINK, "https://a.dev"),
+                TextNode("] and ![x]", TextType.TEXT),
+            ],
+            split_nodes_link([node]),
+        )
+
     def test_split_links(self):
         node = TextNode(
             "This is text with a [link](https://www.google.com) and another [second link](https://www.google.com)",
@@ -306,6 +321,12 @@ This is the same paragraph on a new line
         self.assertEqual(html_node.tag, "h6")
         self.assertEqual(html_node.value, "This is a heading")
         
+    def test_text_node_to_heading_keeps_inner_hashes(self):
+        node = TextNode("## Learning C# and F#", TextType.HEADING)
+        html_node = heading_text_to_heading_leafnode(node)
+        self.assertEqual(html_node.tag, "h2")
+        self.assertEqual(html_node.value, "Learning C# and F#")
+
     def test_text_node_to_heading7_leaf_node(self):
         node = TextNode("####### This is a heading", TextType.HEADING)
         with self.assertRaises(Exception):
@@ -317,8 +338,34 @@ This is the same paragraph on a new line
         """
         leaf_nodes = markdown_to_html_node(md)
         html = leaf_nodes.to_html()
-        self.assertEqual(html, "<div><h1>heading 1</h1></div>")
+        self.assertEqual(html, "<div><h1 id=\"heading-1\">heading 1</h1></div>")
         
+    def test_heading_ids_are_unique(self):
+        toc = []
+        html = markdown_to_html_node("# Intro\n\n## Intro\n\n## Intro 1\n\n### Intro", toc=toc).to_html()
+        self.assertEqual(html, '<div><h1 id="intro">Intro</h1><h2 id="intro-1">Intro</h2>'
+                               '<h2 id="intro-1-1">Intro 1</h2><h3 id="intro-2">Intro</h3></div>')
+        self.assertEqual(toc, [(1, "intro", "Intro"), (2, "intro-1", "Intro"), (2, "intro-1-1", "Intro 1"),
+                               (3, "intro-2", "Intro")])
+
+    def test_slugify_heading(self):
+        self.assertEqual(slugify_heading("Learning C# and F#!"), "learning-c-and-f")
+        self.assertEqual(slugify_heading("Ünïcode_headings"), "ünïcode-headings")
+        self.assertEqual(slugify_heading("???"), "section")
+
+    def test_unique_slug_many_repeats(self):
+        seen = {}
+        slugs = [unique_slug("Step", seen) for _ in range(5000)]
+        self.assertEqual(len(set(slugs)), 5000)
+        self.assertEqual(slugs[:3], ["step", "step-1", "step-2"])
+
+    def test_toc_to_html_node(self):
+        toc = [(1, "title", "Title"), (2, "a", "A"), (3, "a1", "A1"), (4, "deep", "Deep"), (2, "b", "B"), (3, "b1", "B1")]
+        self.assertEqual(toc_to_html_node(toc).to_html(),
+                         '<ul><li><a href="#a">A</a><ul><li><a href="#a1">A1</a><ul><li><a href="#deep">Deep</a></li>'
+                         '</ul></li></ul></li><li><a href="#b">B</a><ul><li><a href="#b1">B1</a></li></ul></li></ul>')
+        self.assertIsNone(toc_to_html_node([(1, "title", "Title")]))
+
     def test_markdown_nodes_to_html_nodes_expecting_code(self):
         md = """
 ```
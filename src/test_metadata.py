@@ -0,0 +1,82 @@
+import os
+import tempfile
+import unittest
+
+from metadata import MetadataIndex
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as file:
+        file.write(text)
+
+
+class TestMetadataIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.index = MetadataIndex(os.path.join(self.root, "cache", "pages.sqlite"))
+
+    def tearDown(self):
+        self.index.close()
+        self.tmp.cleanup()
+
+    def refresh(self, source, text=None):
+        path = os.path.join(self.root, "content", source)
+        if text is not None:
+            write(path, text)
+        return self.index.refresh(path, source, source[:-3] + ".html")
+
+    def test_refresh_is_incremental(self):
+        self.assertTrue(self.refresh("blog/a/index.md", "---\ntitle: A\n---\nbody"))
+        self.assertFalse(self.refresh("blog/a/index.md"))
+        self.assertTrue(self.refresh("blog/a/index.md", "---\ntitle: A changed\n---\nbody"))
+        self.assertEqual(self.index.get("blog/a/index.md")["title"], "A changed")
+
+    def test_pages_and_tags(self):
+        self.refresh("blog/old/index.md", "---\ntitle: Old\ndate: 2023-01-01\ntags: [a]\n---\n")
+        self.refresh("blog/new/index.md", "---\ntitle: New\ndate: 2024-01-01\ntags: [a, b]\n---\n")
+        self.refresh("blog/draft/index.md", "---\ntitle: Draft\ndate: 2025-01-01\ndraft: true\n---\n")
+        self.refresh("index.md", "# Home")
+
+        self.assertEqual([page["title"] for page in self.index.pages("blog/")], ["New", "Old"])
+        self.assertEqual([page["title"] for page in self.index.pages("blog/", include_drafts=True)],
+                         ["Draft", "New", "Old"])
+        self.assertEqual([page["title"] for page in self.index.pages(tag="b")], ["New"])
+        self.assertEqual(self.index.tags("blog/"), ["a", "b"])
+        self.assertEqual(self.index.get("blog/new/index.md")["tags"], ["a", "b"])
+
+    def test_prune_drops_unseen_pages(self):
+        self.refresh("a.md", "# A")
+        self.refresh("b.md", "# B")
+        self.index.seen = {"a.md"}
+        self.index.prune()
+        self.assertIsNone(self.index.get("b.md"))
+        self.assertIsNotNone(self.index.get("a.md"))
+
+    def test_links_are_replaced_per_page(self):
+        self.refresh("a.md", "# A")
+        self.refresh("b.md", "# B")
+        self.index.set_links({"a.md": ["c", "d"], "b.md": ["c"]})
+        self.assertEqual(self.index.in_degrees(), {"c": 2, "d": 1})
+        self.index.set_links({"a.md": ["d"]})
+        self.assertEqual(self.index.in_degrees(), {"c": 1, "d": 1})
+        self.assertEqual(self.index.links(), {"a.md": ["d"], "b.md": ["c"]})
+
+    def test_refresh_keeps_links(self):
+        self.refresh("a.md", "# A")
+        self.index.set_links({"a.md": ["c"]})
+        self.refresh("a.md", "# A changed")
+        self.assertEqual(self.index.in_degrees(), {"c": 1})
+
+    def test_prune_drops_links_of_unseen_pages(self):
+        self.refresh("a.md", "# A")
+        self.refresh("b.md", "# B")
+        self.index.set_links({"a.md": ["c"], "b.md": ["c"]})
+        self.index.seen = {"a.md"}
+        self.index.prune()
+        self.assertEqual(self.index.in_degrees(), {"c": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import os
+import tarfile
+import tempfile
+import unittest
+import zipfile
+from unittest import mock
+
+import output as output_module
+from output import ArchiveOutput, DirectoryOutput, hash_bytes
+
+
+def build_into(output, root):
+    output.make_dirs(os.path.join(root, "blog"))
+    output.write_text(os.path.join(root, "index.html"), "<h1>Home</h1>")
+    output.write_bytes(os.path.join(root, "images", "a.png"), b"\x89PNG")
+
+
+class TestDirectoryOutput(unittest.TestCase):
+    def test_records_manifest(self):
+        with tempfile.TemporaryDirectory() as root:
+            output = DirectoryOutput(root)
+            build_into(output, root)
+            self.assertEqual(output.manifest, {
+                "index.html": hash_bytes(b"<h1>Home</h1>"),
+                "images/a.png": hash_bytes(b"\x89PNG"),
+            })
+            with open(os.path.join(root, "images", "a.png"), "rb") as file:
+                self.assertEqual(file.read(), b"\x89PNG")
+
+    def test_stats_skip_hashing_unchanged_files(self):
+        with tempfile.TemporaryDirectory() as root:
+            out = os.path.join(root, "out")
+            stats_path = os.path.join(root, "stats.json")
+            output = DirectoryOutput(out, stats_path)
+            build_into(output, out)
+            output.save_stats()
+
+            output = DirectoryOutput(out, stats_path)
+            with mock.patch("output.hash_file", wraps=output_module.hash_file) as hash_file:
+                build_into(output, out)
+            hash_file.assert_not_called()
+
+            # A file changed in place no longer matches its stats and is hashed again
+            with open(os.path.join(out, "index.html"), "w") as file:
+                file.write("<h1>Gone</h1>")
+            os.utime(os.path.join(out, "index.html"), ns=(0, 0))
+            output = DirectoryOutput(out, stats_path)
+            build_into(output, out)
+            with open(os.path.join(out, "index.html")) as file:
+                self.assertEqual(file.read(), "<h1>Home</h1>")
+
+
+class TestArchiveOutput(unittest.TestCase):
+    def archive_bytes(self, name):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, name)
+            output = ArchiveOutput(path, "/site/docs")
+            build_into(output, "/site/docs")
+            output.close()
+            with open(path, "rb") as file:
+                return file.read()
+
+    def test_copied_files_match_written_files(self):
+        for name in ("site.tar", "site.zip"):
+            with tempfile.TemporaryDirectory() as tmp:
+                src_path = os.path.join(tmp, "a.png")
+                with open(src_path, "wb") as file:
+                    file.write(b"\x89PNG" * 100000)
+                archives = []
+                for method in ("write", "copy"):
+                    path = os.path.join(tmp, method + name)
+                    output = ArchiveOutput(path, "/site/docs")
+                    if method == "write":
+                        output.write_bytes("/site/docs/images/a.png", b"\x89PNG" * 100000)
+                    else:
+                        with mock.patch("output.io.BytesIO", side_effect=AssertionError("file read into memory")):
+                            output.copy_file(src_path, "/site/docs/images/a.png")
+                    output.close()
+                    self.assertEqual(output.manifest["images/a.png"], hash_bytes(b"\x89PNG" * 100000))
+                    with open(path, "rb") as file:
+                        archives.append(file.read())
+                self.assertEqual(archives[0], archives[1])
+
+    def test_tar_gz_is_deterministic(self):
+        self.assertEqual(self.archive_bytes("site.tar.gz"), self.archive_bytes("site.tar.gz"))
+
+    def test_zip_is_deterministic(self):
+        self.assertEqual(self.archive_bytes("site.zip"), self.archive_bytes("site.zip"))
+
+    def test_tar_contents(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "site.tar")
+            output = ArchiveOutput(path, tmp)
+            build_into(output, tmp)
+            output.close()
+            with tarfile.open(path) as tar:
+                self.assertEqual(tar.getnames(), ["blog", "index.html", "images", "images/a.png"])
+                self.assertEqual(tar.extractfile("index.html").read(), b"<h1>Home</h1>")
+
+    def test_zip_contents(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "site.zip")
+            output = ArchiveOutput(path, tmp)
+            build_into(output, tmp)
+            output.close()
+            with zipfile.ZipFile(path) as archive:
+                self.assertEqual(archive.namelist(), ["blog/", "index.html", "images/", "images/a.png"])
+                self.assertEqual(archive.read("images/a.png"), b"\x89PNG")
+
+    def test_unknown_format(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            with self.assertRaises(ValueError):
+                ArchiveOutput(os.path.join(tmp, "site.rar"), tmp)
+
+
+if __name__ == "__main__":
+    unittest.main()
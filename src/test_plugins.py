@@ -0,0 +1,47 @@
+import unittest
+
+from leafnode import LeafNode
+from main import markdown_to_html_node
+from parentnode import ParentNode
+from plugins import BasePathPlugin, ExternalLinksPlugin, Pipeline, Plugin, make_pipeline
+
+
+class UpperCasePlugin(Plugin):
+    name = "upper"
+    tags = (None, "b")
+
+    def visit(self, node):
+        return LeafNode(node.tag, node.value.upper(), node.props)
+
+
+class TestPipeline(unittest.TestCase):
+    def test_base_path(self):
+        tree = markdown_to_html_node("[home]({{basepath}}) ![cat]({{basepath}}cat.png) [x](https://x.org)")
+        html = make_pipeline("/site/").run(tree).to_html()
+        self.assertEqual(html, '<div><p><a href="/site/">home</a> <img src="/site/cat.png"> '
+                               '<a href="https://x.org">x</a></p></div>')
+
+    def test_tree_is_left_unchanged(self):
+        tree = markdown_to_html_node("[home]({{basepath}})\n\nplain **text**")
+        before = tree.to_html()
+        transformed = make_pipeline("/").run(tree)
+        self.assertEqual(tree.to_html(), before)
+        # Subtrees no plugin changed are shared rather than copied.
+        self.assertIs(transformed.children[1], tree.children[1])
+
+    def test_plugins_are_fused_in_order(self):
+        tree = ParentNode("p", [LeafNode(None, "a "), LeafNode("b", "bold"),
+                                LeafNode("a", "link", {"href": "http://x.org"})])
+        pipeline = Pipeline([UpperCasePlugin(), ExternalLinksPlugin(), BasePathPlugin("/")])
+        self.assertEqual(pipeline.run(tree).to_html(),
+                         '<p>A <b>BOLD</b><a href="http://x.org" target="_blank" rel="noopener noreferrer">link</a></p>')
+        self.assertEqual(pipeline.visits, {"upper": 2, "external_links": 1, "base_path": 1})
+        self.assertEqual([line.split(":")[0] for line in pipeline.report()], ["upper", "external_links", "base_path"])
+
+    def test_empty_pipeline_returns_tree(self):
+        tree = markdown_to_html_node("text")
+        self.assertIs(Pipeline().run(tree), tree)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from preview import PreviewRenderer, make_server
+
+DRAFT = "# Draft\n\nFirst paragraph.\n\n- a list\n- of things\n\nLast paragraph."
+
+
+class TestPreview(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.template_path = os.path.join(self.tmp.name, "template.html")
+        with open(self.template_path, "w") as file:
+            file.write("<title>{{ Title }}</title>{{ Content }}")
+        self.renderer = PreviewRenderer(self.template_path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_render(self):
+        self.assertEqual(self.renderer.render("# Hi\n\nthere"), "<title>Hi</title><div><h1 id=\"hi\">Hi</h1><p>there</p></div>")
+        self.assertEqual(self.renderer.render("no heading yet"), "<title>Preview</title><div><p>no heading yet</p></div>")
+
+    def test_edit_only_rerenders_changed_block(self):
+        self.renderer.render(DRAFT)
+        misses = self.renderer.blocks.misses
+        self.renderer.render(DRAFT.replace("Last", "Lost"))
+        self.assertEqual(self.renderer.blocks.misses, misses + 1)
+
+        self.renderer.render(DRAFT)
+        stats = self.renderer.stats()
+        self.assertEqual(stats["requests"], 3)
+        self.assertEqual(stats["page_hits"], 1)
+
+    def test_server(self):
+        server = make_server(self.renderer, port=0)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        try:
+            def post(index):
+                request = urllib.request.Request(url + "/render", data=f"# Page {index % 4}".encode("utf-8"))
+                with urllib.request.urlopen(request) as response:
+                    return response.read().decode("utf-8")
+
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                pages = list(pool.map(post, range(32)))
+            self.assertEqual(pages[5], "<title>Page 1</title><div><h1 id=\"page-1\">Page 1</h1></div>")
+
+            with urllib.request.urlopen(url + "/stats") as response:
+                stats = json.load(response)
+            self.assertEqual(stats["requests"], 32)
+            self.assertGreater(stats["page_hit_rate"], 0)
+
+            with self.assertRaises(urllib.error.HTTPError) as error:
+                urllib.request.urlopen(urllib.request.Request(url + "/render", data=b"This is **busted."))
+            self.assertEqual(error.exception.code, 400)
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+
+
+if __name__ == "__main__":
+    unittest.main()
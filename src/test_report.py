@@ -0,0 +1,71 @@
+import json
+import os
+import tempfile
+import unittest
+
+from doccache import DocumentCache
+from main import PARSER_VERSION, render_page
+from report import BuildReport
+from template import Template
+
+TEMPLATE = Template("{{ Content }}")
+
+
+def stats_for(output_bytes, total_ms, cache="miss"):
+    return {"blocks": 1, "text_nodes": 2, "html_nodes": output_bytes // 10, "parse_seconds": total_ms / 2000,
+            "render_seconds": total_ms / 2000, "cache": cache}
+
+
+class TestBuildReport(unittest.TestCase):
+    def test_render_page_stats(self):
+        stats = {}
+        page = render_page({}, "# Title\n\nSome **bold** [link](/x)\n\n- one\n- two", TEMPLATE, "/", stats=stats)
+        self.assertEqual(stats["blocks"], 3)
+        # "Title"; "Some ", "bold", " ", "link"; "one"; "two"
+        self.assertEqual(stats["text_nodes"], 7)
+        # div, h1, p and its four children, ul and its two li with a text child each
+        self.assertEqual(stats["html_nodes"], 12)
+        self.assertEqual(stats["cache"], "off")
+        self.assertGreater(stats["render_seconds"], 0)
+        self.assertTrue(page.startswith("<div><h1"))
+
+    def test_render_page_stats_from_cache(self):
+        markdown = "# Title\n\ntext with `code`"
+        with tempfile.TemporaryDirectory() as root:
+            first, second = {}, {}
+            render_page({}, markdown, TEMPLATE, "/", doc_cache=DocumentCache(root, PARSER_VERSION), stats=first)
+            render_page({}, markdown, TEMPLATE, "/", doc_cache=DocumentCache(root, PARSER_VERSION), stats=second)
+            self.assertEqual((first["cache"], second["cache"]), ("miss", "hit"))
+            for field in ("blocks", "text_nodes", "html_nodes"):
+                self.assertEqual(first[field], second[field])
+
+    def test_totals_and_outliers(self):
+        report = BuildReport(top=2)
+        report.add("a.html", 100, 1000, stats_for(1000, 5.0))
+        report.add("b.html", 200, 3000, stats_for(3000, 1.0, "hit"))
+        report.add("c.html", 300, 2000, stats_for(2000, 9.0))
+        totals = report.totals()
+        self.assertEqual(totals["pages"], 3)
+        self.assertEqual(totals["source_bytes"], 600)
+        self.assertEqual(totals["output_bytes"], 6000)
+        self.assertEqual(totals["total_ms"], 15.0)
+        self.assertEqual((totals["cache_hit"], totals["cache_miss"]), (1, 2))
+        outliers = report.outliers()
+        self.assertEqual(outliers["output_bytes"], ["b.html", "c.html"])
+        self.assertEqual(outliers["total_ms"], ["c.html", "a.html"])
+        self.assertTrue(report.summary()[0].startswith("Build report: 3 pages"))
+
+    def test_write(self):
+        report = BuildReport()
+        report.add("a.html", 1, 2, stats_for(2, 1.0))
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, "reports", "build.json")
+            report.write(path)
+            with open(path) as file:
+                written = json.load(file)
+        self.assertEqual(written["pages"][0]["path"], "a.html")
+        self.assertEqual(written["totals"]["pages"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from main import main
+from output import DirectoryOutput, write_manifest
+from shard import SHARD_MANIFEST, merge_shards, parse_shard, shard_of
+
+
+def write_site(root):
+    files = {
+        "template.html": "<title>{{ Title }}</title>{{ Content }}",
+        "static/index.css": "body { color: red; }",
+        "static/images/a.png": "a",
+        "static/images/b.png": "b",
+        "content/index.md": "# Home",
+        "content/blog/one/index.md": "# One",
+        "content/blog/two/index.md": "# Two",
+        "content/blog/three/index.md": "# Three",
+    }
+    for rel_path, text in files.items():
+        path = os.path.join(root, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            file.write(text)
+
+
+def read_tree(root):
+    tree = {}
+    for dir_path, _, file_names in os.walk(root):
+        for file_name in file_names:
+            path = os.path.join(dir_path, file_name)
+            with open(path, "rb") as file:
+                tree[os.path.relpath(path, root)] = file.read()
+    return tree
+
+
+class TestShard(unittest.TestCase):
+    def test_parse_shard(self):
+        self.assertEqual(parse_shard("2/4"), (2, 4))
+
+    def test_parse_shard_out_of_range(self):
+        with self.assertRaises(ValueError):
+            parse_shard("5/4")
+        with self.assertRaises(ValueError):
+            parse_shard("two")
+
+    def test_shard_of_is_stable(self):
+        self.assertEqual(shard_of("content/blog/tom/index.md", 4), shard_of("content/blog/tom/index.md", 4))
+        self.assertIn(shard_of("content/index.md", 3), (1, 2, 3))
+
+    def test_shard_of_is_balanced(self):
+        counts = [0, 0, 0, 0]
+        for index in range(4000):
+            counts[shard_of(f"content/blog/post-{index}/index.md", 4) - 1] += 1
+        for count in counts:
+            self.assertTrue(800 < count < 1200)
+
+    def test_merge_detects_conflicts(self):
+        with tempfile.TemporaryDirectory() as root:
+            for index in (1, 2):
+                shard_dir = os.path.join(root, f"shard{index}")
+                os.makedirs(shard_dir)
+                write_manifest(os.path.join(shard_dir, SHARD_MANIFEST), {"index.html": f"hash{index}"},
+                               shard_index=index, shard_count=2)
+            with self.assertRaises(ValueError):
+                merge_shards([os.path.join(root, "shard1"), os.path.join(root, "shard2")],
+                             DirectoryOutput(os.path.join(root, "docs")))
+
+    def test_merge_detects_different_base_paths(self):
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as root:
+            write_site(root)
+            os.chdir(root)
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    main(["/a/", "--out", "shard1", "--shard", "1/2"])
+                    main(["/b/", "--out", "shard2", "--shard", "2/2"])
+                    main(["/a/", "--out", "drafts2", "--shard", "2/2", "--drafts"])
+                    with self.assertRaisesRegex(ValueError, "different base paths"):
+                        main(["/a/", "--out", "merged", "--merge", "shard1", "shard2"])
+                    with self.assertRaisesRegex(ValueError, "different settings"):
+                        main(["/a/", "--out", "merged", "--merge", "shard1", "drafts2"])
+            finally:
+                os.chdir(cwd)
+
+    def test_full_build_after_shard_build_keeps_every_listing(self):
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as root:
+            write_site(root)
+            os.chdir(root)
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    main(["/"])
+                    listings = {path for path in read_tree(os.path.join(root, "docs")) if "/page/" in path
+                                or path in ("blog/index.html", "blog/archive/index.html")}
+                    for index in (1, 2):
+                        main(["/", "--out", f"shard{index}", "--shard", f"{index}/2"])
+                    main(["/"])
+            finally:
+                os.chdir(cwd)
+            self.assertIn("blog/index.html", listings)
+            self.assertLessEqual(listings, set(read_tree(os.path.join(root, "docs"))))
+
+    def test_merge_detects_missing_shard(self):
+        with tempfile.TemporaryDirectory() as root:
+            shard_dir = os.path.join(root, "shard1")
+            os.makedirs(shard_dir)
+            write_manifest(os.path.join(shard_dir, SHARD_MANIFEST), {}, shard_index=1, shard_count=2)
+            with self.assertRaises(ValueError):
+                merge_shards([shard_dir], DirectoryOutput(os.path.join(root, "docs")))
+
+    def test_sharded_build_matches_full_build(self):
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as root:
+            write_site(root)
+            os.chdir(root)
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    main(["/", "--out", "full"])
+                    for index in (1, 2, 3):
+                        main(["/", "--out", f"shard{index}", "--shard", f"{index}/3"])
+                    main(["/", "--out", "merged", "--merge", "shard1", "shard2", "shard3"])
+            finally:
+                os.chdir(cwd)
+            self.assertEqual(read_tree(os.path.join(root, "full")), read_tree(os.path.join(root, "merged")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from main import main
+from sitebuilder import SiteBuilder
+from test_shard import read_tree, write_site
+from vfs import OSFileSystem
+
+SITE = {
+    "template.html": "<title>{{ Title }}</title><link href=\"{{basepath}}index.css\">{{ Content }}",
+    "post.html": "<h1>Post</h1>{{ Content }}",
+    "static/index.css": "body {}",
+    "static/images/a.png": b"\x89PNG",
+    "content/index.md": "# Home\n\nHello **world**",
+    "content/blog/one/index.md": "---\ntemplate: post.html\n---\n# One",
+    "content/blog/draft/index.md": "---\ndraft: true\n---\n# Draft",
+    "content/blog/one/pic.png": b"PNG",
+}
+
+
+class TestSiteBuilder(unittest.TestCase):
+    def test_build_in_memory(self):
+        files = SiteBuilder(SITE, base_path="/site/").build()
+        self.assertEqual(sorted(files), ["blog/archive/index.html", "blog/index.html", "blog/one/index.html",
+                                         "blog/one/pic.png", "images/a.png", "index.css", "index.html"])
+        self.assertIn(b'<a href="/site/blog/one/">One</a>', files["blog/index.html"])
+        self.assertNotIn(b"Draft", files["blog/index.html"])
+        self.assertEqual(files["images/a.png"], b"\x89PNG")
+        self.assertEqual(files["blog/one/pic.png"], b"PNG")
+        self.assertEqual(files["index.html"],
+                         b"<title>Home</title><link href=\"/site/index.css\"><div><h1 id=\"home\">Home</h1><p>Hello <b>world</b></p></div>")
+        self.assertEqual(files["blog/one/index.html"], b"<h1>Post</h1><div><h1 id=\"one\">One</h1></div>")
+
+    def test_render_single_page(self):
+        builder = SiteBuilder(SITE)
+        self.assertEqual(builder.render_markdown("# Preview"), "<title>Preview</title><link href=\"/index.css\"><div><h1 id=\"preview\">Preview</h1></div>")
+        self.assertIsNone(builder.render("content/blog/draft/index.md"))
+
+    def test_rendered_pages_are_cached(self):
+        builder = SiteBuilder(SITE)
+        builder.build()
+        misses = builder.pages.misses
+        builder.build()
+        self.assertEqual(builder.pages.misses, misses)
+        self.assertGreater(builder.pages.hits, 0)
+
+    def test_matches_build_on_disk(self):
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as root:
+            write_site(root)
+            with open(os.path.join(root, "content", "blog", "one", "pic.png"), "wb") as file:
+                file.write(b"PNG")
+            # Byte-identical to a static file, so it is stored as a link to it
+            with open(os.path.join(root, "content", "blog", "two", "a.png"), "wb") as file:
+                file.write(b"a")
+            os.chdir(root)
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    main(["/base/"])
+            finally:
+                os.chdir(cwd)
+            self.assertIn("blog/one/pic.png", read_tree(os.path.join(root, "docs")))
+            on_disk = {path.replace(os.sep, "/"): data for path, data in read_tree(os.path.join(root, "docs")).items()}
+            self.assertEqual(SiteBuilder(OSFileSystem(root), base_path="/base/").build(), on_disk)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+import xml.etree.ElementTree as ElementTree
+
+from main import main
+from metadata import MetadataIndex
+from output import MemoryOutput
+from sitemap import Sitemap, page_updated, write_feed
+from test_shard import write_site
+
+SITEMAP = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
+ATOM = "{http://www.w3.org/2005/Atom}"
+
+
+def locations(data, tag):
+    return [loc.text for loc in ElementTree.fromstring(data).iter(f"{SITEMAP}{tag}")]
+
+
+class TestSitemap(unittest.TestCase):
+    def test_single_file(self):
+        output = MemoryOutput()
+        sitemap = Sitemap("https://example.com/", "/site/")
+        sitemap.add("index.html", 0)
+        sitemap.add("blog/a&b/index.html")
+        self.assertEqual(sitemap.write(output), 1)
+        self.assertEqual(sorted(output.files), ["sitemap.xml"])
+        self.assertEqual(locations(output.files["sitemap.xml"], "loc"),
+                         ["https://example.com/site/", "https://example.com/site/blog/a&b/"])
+        self.assertEqual(locations(output.files["sitemap.xml"], "lastmod"), ["1970-01-01T00:00:00+00:00"])
+
+    def test_split_at_limit_with_index(self):
+        output = MemoryOutput()
+        sitemap = Sitemap("https://example.com", "/", limit=2)
+        for number in range(5):
+            sitemap.add(f"page{number}.html", number * 10 ** 9)
+        self.assertEqual(sitemap.write(output), 3)
+        self.assertEqual(sorted(output.files), ["sitemap-1.xml", "sitemap-2.xml", "sitemap-3.xml", "sitemap.xml"])
+        self.assertEqual(locations(output.files["sitemap.xml"], "loc"),
+                         [f"https://example.com/sitemap-{number}.xml" for number in (1, 2, 3)])
+        self.assertEqual(locations(output.files["sitemap.xml"], "lastmod")[1], "1970-01-01T00:00:03+00:00")
+        self.assertEqual(locations(output.files["sitemap-3.xml"], "loc"), ["https://example.com/page4.html"])
+
+    def test_empty_sitemap(self):
+        output = MemoryOutput()
+        Sitemap("https://example.com", "/").write(output)
+        self.assertEqual(locations(output.files["sitemap.xml"], "loc"), [])
+
+
+class TestFeed(unittest.TestCase):
+    def test_newest_pages(self):
+        with tempfile.TemporaryDirectory() as root:
+            index = MetadataIndex(os.path.join(root, "pages.sqlite"))
+            pages = {"old": "date: 2023-01-01", "new": "date: 2024-01-01\ndescription: Fresh",
+                     "draft": "date: 2025-01-01\ndraft: true", "undated": "title: Undated"}
+            for name, front_matter in pages.items():
+                path = os.path.join(root, name + ".md")
+                with open(path, "w") as file:
+                    file.write(f"---\ntitle: {name.title()}\n{front_matter}\n---\n")
+                index.refresh(path, f"blog/{name}/index.md", f"blog/{name}/index.html")
+            output = MemoryOutput()
+            write_feed(output, index, "blog", "https://example.com", "/site/", entries=2)
+            self.assertEqual(page_updated(index.get("blog/new/index.md")), "2024-01-01T00:00:00+00:00")
+            index.close()
+
+        feed = ElementTree.fromstring(output.files["blog/atom.xml"])
+        self.assertEqual(feed.find(f"{ATOM}updated").text, "2024-01-01T00:00:00+00:00")
+        entries = feed.findall(f"{ATOM}entry")
+        self.assertEqual([entry.find(f"{ATOM}id").text for entry in entries],
+                         ["https://example.com/site/blog/new/", "https://example.com/site/blog/old/"])
+        self.assertEqual(entries[0].find(f"{ATOM}summary").text, "Fresh")
+
+
+class TestSitemapBuild(unittest.TestCase):
+    def test_unchanged_files_are_kept(self):
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as root:
+            write_site(root)
+            os.chdir(root)
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    main(["/site/", "--site-url", "https://example.com"])
+                    first = os.stat(os.path.join(root, "docs", "sitemap.xml"))
+                    main(["/site/", "--site-url", "https://example.com"])
+            finally:
+                os.chdir(cwd)
+            sitemap = os.path.join(root, "docs", "sitemap.xml")
+            self.assertEqual(os.stat(sitemap).st_ino, first.st_ino)
+            self.assertEqual(os.stat(sitemap).st_mode & 0o777, 0o644)
+            with open(sitemap, "rb") as file:
+                self.assertIn("https://example.com/site/blog/one/", locations(file.read(), "loc"))
+            self.assertTrue(os.path.isfile(os.path.join(root, "docs", "blog", "atom.xml")))
+
+    def test_site_url_needs_every_page(self):
+        with contextlib.redirect_stderr(io.StringIO()), self.assertRaises(SystemExit):
+            main(["/", "--site-url", "https://example.com", "--shard", "1/2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import contextlib
+import io
+import os
+import tempfile
+import time
+import unittest
+
+from main import main
+from output import MemoryOutput
+from stages import PageStages
+from test_shard import read_tree, write_site
+
+
+class SlowOutput(MemoryOutput):
+    """A MemoryOutput that takes a while to write every file, like network storage."""
+    def __init__(self, delay=0.0, fail_on=None):
+        super().__init__()
+        self.delay = delay
+        self.fail_on = fail_on
+        self.order = []
+
+    def write_bytes(self, path, data):
+        if path == self.fail_on:
+            raise OSError(f"cannot write {path}")
+        time.sleep(self.delay)
+        self.order.append(path)
+        super().write_bytes(path, data)
+
+
+def render(job, text):
+    return (f"/{job}.html", text.upper().encode("utf-8")) if text else None
+
+
+class TestPageStages(unittest.TestCase):
+    def test_single_writer_keeps_order(self):
+        output = SlowOutput()
+        jobs = [f"page{index}" for index in range(50)]
+        PageStages(output, writers=1, depth=4, batch=3).run(jobs, lambda job: job, render)
+        self.assertEqual(output.order, [f"/{job}.html" for job in jobs])
+        self.assertEqual(output.files["page7.html"], b"PAGE7")
+
+    def test_every_page_is_written(self):
+        output = SlowOutput()
+        jobs = [f"page{index}" for index in range(100)] + ["skipped"]
+        PageStages(output, writers=4, depth=2).run(jobs, lambda job: "" if job == "skipped" else job, render)
+        self.assertEqual(sorted(output.files), sorted(f"page{index}.html" for index in range(100)))
+
+    def test_writes_overlap_on_slow_storage(self):
+        jobs = [f"page{index}" for index in range(20)]
+        start = time.perf_counter()
+        PageStages(SlowOutput(0.01), writers=1).run(jobs, lambda job: job, render)
+        one_writer = time.perf_counter() - start
+        start = time.perf_counter()
+        PageStages(SlowOutput(0.01), writers=5).run(jobs, lambda job: job, render)
+        five_writers = time.perf_counter() - start
+        self.assertLess(five_writers, one_writer / 2)
+
+    def test_read_error_is_raised(self):
+        def read(job):
+            if job == "page3":
+                raise FileNotFoundError(job)
+            return job
+        with self.assertRaises(FileNotFoundError):
+            PageStages(SlowOutput(), depth=1).run([f"page{index}" for index in range(10)], read, render)
+
+    def test_write_error_is_raised(self):
+        output = SlowOutput(fail_on="/page3.html")
+        with self.assertRaises(OSError):
+            PageStages(output, depth=1).run([f"page{index}" for index in range(50)], lambda job: job, render)
+
+    def test_render_error_stops_the_stages(self):
+        def failing_render(job, text):
+            if job == "page5":
+                raise ValueError("bad page")
+            return render(job, text)
+        with self.assertRaises(ValueError):
+            PageStages(SlowOutput(), depth=1).run([f"page{index}" for index in range(50)], lambda job: job,
+                                                  failing_render)
+
+    def test_staged_build_matches_serial_build(self):
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as root:
+            write_site(root)
+            os.chdir(root)
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    main(["/", "--out", "serial", "--writers", "0"])
+                    main(["/", "--out", "staged", "--writers", "3"])
+                    main(["/", "--archive", "serial.tar", "--writers", "0"])
+                    main(["/", "--archive", "staged.tar", "--writers", "3"])
+            finally:
+                os.chdir(cwd)
+            self.assertEqual(read_tree(os.path.join(root, "serial")), read_tree(os.path.join(root, "staged")))
+            with open(os.path.join(root, "serial.tar"), "rb") as serial, open(os.path.join(root, "staged.tar"), "rb") as staged:
+                self.assertEqual(serial.read(), staged.read())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from output import DirectoryOutput
+from staging import abort_staging, begin_staging, commit_staging, rollback
+
+
+def build(live_dir, files, mode):
+    staging_dir = begin_staging(live_dir, mode)
+    output = DirectoryOutput(staging_dir)
+    for rel_path, text in files.items():
+        output.write_text(os.path.join(staging_dir, rel_path), text)
+    output.prune()
+    commit_staging(staging_dir, live_dir, mode)
+
+
+def read(path):
+    with open(path) as file:
+        return file.read()
+
+
+class TestStaging(unittest.TestCase):
+    def test_rename_swap_keeps_previous(self):
+        with tempfile.TemporaryDirectory() as root:
+            live_dir = os.path.join(root, "docs")
+            build(live_dir, {"index.html": "one", "old.html": "old"}, "rename")
+            build(live_dir, {"index.html": "two"}, "rename")
+            self.assertEqual(read(os.path.join(live_dir, "index.html")), "two")
+            self.assertFalse(os.path.exists(os.path.join(live_dir, "old.html")))
+            self.assertEqual(read(os.path.join(live_dir + ".previous", "index.html")), "one")
+
+            rollback(live_dir)
+            self.assertEqual(read(os.path.join(live_dir, "index.html")), "one")
+            self.assertEqual(read(os.path.join(live_dir + ".previous", "index.html")), "two")
+
+    def test_unchanged_files_are_hardlinked(self):
+        with tempfile.TemporaryDirectory() as root:
+            live_dir = os.path.join(root, "docs")
+            build(live_dir, {"same.html": "same", "changed.html": "one"}, "rename")
+            build(live_dir, {"same.html": "same", "changed.html": "two"}, "rename")
+            previous_dir = live_dir + ".previous"
+            self.assertTrue(os.path.samefile(os.path.join(live_dir, "same.html"),
+                                             os.path.join(previous_dir, "same.html")))
+            self.assertFalse(os.path.samefile(os.path.join(live_dir, "changed.html"),
+                                              os.path.join(previous_dir, "changed.html")))
+            self.assertEqual(read(os.path.join(previous_dir, "changed.html")), "one")
+
+    def test_aborted_build_leaves_live_untouched(self):
+        with tempfile.TemporaryDirectory() as root:
+            live_dir = os.path.join(root, "docs")
+            build(live_dir, {"index.html": "one"}, "rename")
+            staging_dir = begin_staging(live_dir)
+            DirectoryOutput(staging_dir).write_text(os.path.join(staging_dir, "index.html"), "broken")
+            abort_staging(staging_dir)
+            self.assertEqual(read(os.path.join(live_dir, "index.html")), "one")
+            self.assertFalse(os.path.exists(staging_dir))
+
+    @unittest.skipUnless(sys.platform.startswith("linux"), "paths can only be exchanged on Linux")
+    def test_rename_swap_never_leaves_live_missing(self):
+        with tempfile.TemporaryDirectory() as root:
+            live_dir = os.path.join(root, "docs")
+            build(live_dir, {"index.html": "one"}, "rename")
+            with mock.patch("os.rename", wraps=os.rename) as rename:
+                build(live_dir, {"index.html": "two"}, "rename")
+                rollback(live_dir)
+            # The live directory is exchanged with another one, never renamed away
+            self.assertNotIn(live_dir, [call.args[0] for call in rename.call_args_list])
+            self.assertEqual(read(os.path.join(live_dir, "index.html")), "one")
+            self.assertEqual(read(os.path.join(live_dir + ".previous", "index.html")), "two")
+
+    def test_symlink_swap_and_rollback(self):
+        with tempfile.TemporaryDirectory() as root:
+            live_dir = os.path.join(root, "docs")
+            build(live_dir, {"index.html": "one"}, "symlink")
+            build(live_dir, {"index.html": "two"}, "symlink")
+            build(live_dir, {"index.html": "three"}, "symlink")
+            self.assertTrue(os.path.islink(live_dir))
+            self.assertEqual(read(os.path.join(live_dir, "index.html")), "three")
+            self.assertEqual(len(os.listdir(live_dir + ".builds")), 2)
+
+            rollback(live_dir)
+            self.assertEqual(read(os.path.join(live_dir, "index.html")), "two")
+
+
+if __name__ == "__main__":
+    unittest.main()
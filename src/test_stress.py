@@ -0,0 +1,66 @@
+import time
+import unittest
+
+from main import markdown_to_html_node
+
+# Adversarial inputs, each a function of a size n. Inputs that stay cheap per
+# character are sized so the larger run is a megabyte-long line.
+CASES = {
+    "open brackets": (lambda n: "[" * n, 62_500),
+    "image openers": (lambda n: "![" * n, 31_250),
+    "nested brackets": (lambda n: "[" * n + "]" * n, 31_250),
+    "unclosed links": (lambda n: "[a](" * n, 15_625),
+    "unclosed images": (lambda n: "![a](b" * n, 10_000),
+    "brackets without urls": (lambda n: "[a]" * n, 2_000),
+    "bangs": (lambda n: "!" * n + "[a](b)", 62_500),
+    "underscore pairs": (lambda n: "_a_ " * n, 500),
+    "backtick pairs": (lambda n: "`a` " * n, 500),
+    "unclosed backtick": (lambda n: "`" + "a" * n, 62_500),
+    "long heading run": (lambda n: "# " + "#" * n, 62_500),
+    "nested quotes": (lambda n: "> " * n + "x", 31_250),
+    "quote lines": (lambda n: "> a\n" * n, 500),
+    "list lines": (lambda n: "- [a](b)\n" * n, 500),
+    "links": (lambda n: "[a](b) " * n, 500),
+    "blocks": (lambda n: "a\n\n" * n, 500),
+    "repeated headings": (lambda n: "## a\n\n" * n, 500),
+    "long line": (lambda n: "a" * n, 62_500),
+}
+
+# Growing a linear input sixteenfold should take about sixteen times as long;
+# a quadratic one takes 256 times as long.
+GROWTH = 16
+MAX_GROWTH = 50
+# Timings below this are dominated by noise rather than by the input.
+NOISE_FLOOR = 0.0005
+TIME_LIMIT = 5.0
+
+
+def render_time(markdown):
+    best = None
+    for _ in range(2):
+        start = time.perf_counter()
+        try:
+            markdown_to_html_node(markdown).to_html()
+        except Exception:
+            # Rejecting malformed input is fine, as long as it is rejected quickly.
+            pass
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+class TestParserStress(unittest.TestCase):
+    def test_parser_is_linear(self):
+        for name, (make_input, size) in CASES.items():
+            with self.subTest(name):
+                small = render_time(make_input(size))
+                self.assertLess(small, TIME_LIMIT, f"{name} took {small:.2f}s")
+                large = render_time(make_input(size * GROWTH))
+                self.assertLess(large, TIME_LIMIT, f"{name} took {large:.2f}s")
+                growth = large / max(small, NOISE_FLOOR)
+                self.assertLess(growth, MAX_GROWTH,
+                                f"{name} grew {growth:.1f}x for {GROWTH}x the input ({small:.4f}s -> {large:.4f}s)")
+
+
+if __name__ == "__main__":
+    unittest.main()
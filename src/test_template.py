@@ -0,0 +1,42 @@
+import os
+import tempfile
+import unittest
+
+from template import Template, compile_template, load_template
+
+
+class TestTemplate(unittest.TestCase):
+    def test_render(self):
+        template = Template("<title>{{ Title }}</title><a href=\"{{basepath}}\">{{ Content }}</a>{{ Title }}")
+        self.assertEqual(template.render("Hi", "<p>{{basepath}}x</p>", "/site/"),
+                         "<title>Hi</title><a href=\"/site/\"><p>{{basepath}}x</p></a>Hi")
+
+    def test_render_head(self):
+        template = Template("<head><title>{{ Title }}</title></head><body>{{ Content }}</body>")
+        self.assertEqual(template.render("Hi", "x", "/", head="<style></style>"),
+                         "<head><title>Hi</title><style></style></head><body>x</body>")
+        self.assertEqual(Template("{{ Content }}").render("Hi", "x", "/", head="<style></style>"), "x")
+
+    def test_render_toc(self):
+        template = Template("<nav>{{ TOC }}</nav>{{ Content }}")
+        self.assertTrue(template.has_toc)
+        self.assertFalse(Template("{{ Content }}").has_toc)
+        self.assertEqual(template.render("Hi", "x", "/", toc="<ul></ul>"), "<nav><ul></ul></nav>x")
+
+    def test_compile_template_reuses_compiled(self):
+        self.assertIs(compile_template("{{ Content }}"), compile_template("{{ Content }}"))
+
+    def test_load_template_reloads_changed_file(self):
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, "template.html")
+            with open(path, "w") as file:
+                file.write("one {{ Content }}")
+            self.assertEqual(load_template(path).render("", "x", "/"), "one x")
+            self.assertIs(load_template(path), load_template(path))
+            with open(path, "w") as file:
+                file.write("two, changed {{ Content }}")
+            self.assertEqual(load_template(path).render("", "x", "/"), "two, changed x")
+
+
+if __name__ == "__main__":
+    unittest.main()
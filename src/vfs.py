@@ -0,0 +1,60 @@
+import os
+
+
+def normalize_path(path):
+    return path.replace(os.sep, "/").strip("/")
+
+
+class MemoryFileSystem:
+    """
+    A read-only file system over a mapping of "/"-separated paths to their
+    contents, given as str or bytes.
+
+    :param files: The mapping, e.g. {"content/index.md": "# Home"}
+    """
+    def __init__(self, files):
+        self.files = {normalize_path(path): data for path, data in files.items()}
+
+    def walk(self, directory):
+        """:return: The sorted paths of all files below directory"""
+        prefix = normalize_path(directory) + "/"
+        return sorted(path for path in self.files if path.startswith(prefix))
+
+    def exists(self, path):
+        return normalize_path(path) in self.files
+
+    def read_bytes(self, path):
+        data = self.files[normalize_path(path)]
+        return data.encode("utf-8") if isinstance(data, str) else data
+
+    def read_text(self, path):
+        data = self.files[normalize_path(path)]
+        return data if isinstance(data, str) else data.decode("utf-8")
+
+
+class OSFileSystem:
+    """
+    The same read-only interface as MemoryFileSystem over a directory on disk.
+
+    :param root: The directory paths are relative to
+    """
+    def __init__(self, root):
+        self.root = root
+
+    def walk(self, directory):
+        paths = []
+        for dir_path, _, file_names in os.walk(os.path.join(self.root, directory)):
+            for file_name in file_names:
+                paths.append(normalize_path(os.path.relpath(os.path.join(dir_path, file_name), self.root)))
+        return sorted(paths)
+
+    def exists(self, path):
+        return os.path.isfile(os.path.join(self.root, path))
+
+    def read_bytes(self, path):
+        with open(os.path.join(self.root, path), "rb") as file:
+            return file.read()
+
+    def read_text(self, path):
+        with open(os.path.join(self.root, path), "r") as file:
+            return file.read()